@@ -0,0 +1,59 @@
+from player import RESOURCES
+
+VERBS = ["roll", "pass", "build_settlement", "build_road", "build_city", "bank_trade"]
+
+
+def action_name(entry):
+    verb, *args = entry
+    if verb == "build_road":
+        args = args[0]
+    return " ".join([verb] + [str(a) for a in args])
+
+
+class ActionTable:
+    def __init__(self, node_list, edge_list):
+        self.entries = [("roll",), ("pass",)]
+        self.roll = 0
+        self.pass_turn = 1
+
+        start = len(self.entries)
+        self.entries += [("build_settlement", node) for node in node_list]
+        self.settlements = slice(start, len(self.entries))
+
+        start = len(self.entries)
+        self.entries += [("build_road", edge) for edge in edge_list]
+        self.roads = slice(start, len(self.entries))
+
+        start = len(self.entries)
+        self.entries += [("build_city", node) for node in node_list]
+        self.cities = slice(start, len(self.entries))
+
+        start = len(self.entries)
+        self.trade_index = {}
+        for give in RESOURCES:
+            for receive in RESOURCES:
+                if give != receive:
+                    self.trade_index[(give, receive)] = len(self.entries)
+                    self.entries.append(("bank_trade", give, receive))
+        self.trades = slice(start, len(self.entries))
+
+        self.names = [action_name(entry) for entry in self.entries]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        for i, entry in enumerate(self.entries):
+            self.index[entry] = i
+            if entry[0] == "build_road":
+                a, b = entry[1]
+                self.index[("build_road", (b, a))] = i
+                self.index[f"build_road {b} {a}"] = i
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, action):
+        if isinstance(action, str) or isinstance(action, tuple):
+            idx = self.index.get(action)
+            return None if idx is None else self.entries[idx]
+        return self.entries[action]
+
+    def encode(self, action):
+        return self.index[action]
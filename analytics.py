@@ -0,0 +1,92 @@
+import numpy as np
+
+from catanboard import pips
+from player import RESOURCES
+
+ROLLS = np.arange(2, 13)
+ROLL_PROBS = np.array([pips(r) for r in ROLLS], dtype=np.float64) / 36.0
+
+
+def board_arrays(tiles):
+    frequency = np.array([t.frequency or 0 for t in tiles], dtype=np.int64)
+    resource = np.zeros((len(tiles), len(RESOURCES)), dtype=np.float64)
+    for i, tile in enumerate(tiles):
+        if tile.get_resource() is not None:
+            resource[i, RESOURCES.index(tile.resource)] = 1.0
+    return frequency, resource
+
+
+def position_arrays(game):
+    frequency, resource = board_arrays(game.tiles)
+    robber = np.zeros(len(game.tiles), dtype=bool)
+    if game.robber_tile is not None:
+        robber[game.tile_index[game.robber_tile]] = True
+    return frequency, resource, game.tile_weight, robber
+
+
+def payouts(frequency, resource, weights, robber=None):
+    # cards each seat receives of each resource for every dice sum: (..., roll, seat, resource).
+    # weights is the per-tile building weight (1 per settlement, 2 per city corner), as in
+    # Game.tile_weight; leading dimensions batch over boards or positions
+    rolled = (np.asarray(frequency)[..., None, :] == ROLLS[:, None]).astype(np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if robber is not None:
+        weights = weights * ~np.asarray(robber, dtype=bool)[..., None]
+    return np.einsum('...rt,...ts,...tk->...rsk', rolled, weights, np.asarray(resource, dtype=np.float64))
+
+
+def income_moments(payout):
+    # mean and variance of one roll's income, per seat and resource: (..., seat, resource) each
+    probs = ROLL_PROBS[:, None, None]
+    mean = (probs * payout).sum(axis=-3)
+    var = (probs * payout ** 2).sum(axis=-3) - mean ** 2
+    return mean, np.maximum(var, 0.0)
+
+
+def expected_income(game):
+    # per seat: expected cards of each resource per roll and its variance, robber included
+    return income_moments(payouts(*position_arrays(game)))
+
+
+def turns_to_afford(payout, hand, cost, horizon=20, rolls_per_turn=1):
+    # P(cost is covered by hand plus income within t turns) for t = 0..horizon.
+    # payout is one seat's (..., roll, resource) slice of payouts(); the chain runs over the
+    # still-missing cards of each needed resource, so it has at most prod(cost + 1) states
+    if isinstance(cost, dict):
+        cost = [cost.get(res, 0) for res in RESOURCES]
+    need = np.asarray(cost, dtype=np.int64)
+    payout = np.asarray(payout)
+    batch = payout.shape[:-2]
+    payout = payout.reshape(-1, len(ROLLS), len(RESOURCES)).astype(np.int64)
+    hand = np.broadcast_to(np.asarray(hand, dtype=np.int64), batch + (len(RESOURCES),)).reshape(-1, len(RESOURCES))
+    B = len(payout)
+
+    used = np.flatnonzero(need)
+    if not len(used):
+        return np.ones(batch + (horizon + 1,))
+    dims = tuple(need[used] + 1)
+    S = int(np.prod(dims))
+    states = np.stack(np.unravel_index(np.arange(S), dims), axis=-1)
+
+    after = np.maximum(states[None, None] - payout[:, :, None, used], 0)
+    nxt = np.ravel_multi_index(tuple(np.moveaxis(after, -1, 0)), dims)
+    transition = np.zeros((B, S, S))
+    np.add.at(transition, (np.arange(B)[:, None, None], np.arange(S)[None, None, :], nxt),
+              np.broadcast_to(ROLL_PROBS[None, :, None], nxt.shape))
+    if rolls_per_turn != 1:
+        transition = np.linalg.matrix_power(transition, rolls_per_turn)
+
+    deficit = np.clip(need - hand, 0, None)[:, used]
+    dist = np.zeros((B, S))
+    dist[np.arange(B), np.ravel_multi_index(tuple(deficit.T), dims)] = 1.0
+    cdf = np.empty((B, horizon + 1))
+    cdf[:, 0] = dist[:, 0]
+    for t in range(1, horizon + 1):
+        dist = np.einsum('bs,bst->bt', dist, transition)
+        cdf[:, t] = dist[:, 0]
+    return cdf.reshape(batch + (horizon + 1,))
+
+
+def expected_turns(cdf):
+    # mean turns to afford, truncated at the horizon (unreachable builds count as horizon + 1)
+    return (1.0 - cdf).sum(axis=-1)
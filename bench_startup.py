@@ -0,0 +1,55 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ENGINE_MODULES = ["player", "catanboard", "observation", "game", "actions", "environment", "policy"]
+HEAVY_MODULES = ["torch", "gym", "networkx", "matplotlib"]
+IMPORT_BUDGET_MS = 250.0
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {modules}
+elapsed = (time.perf_counter() - start) * 1000.0
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(f"{{elapsed:.3f}} {{','.join(heavy)}}")
+"""
+
+
+def measure(modules, runs):
+    probe = PROBE.format(modules=", ".join(modules), heavy=HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    heavy = set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", probe], cwd=here, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(out[0]))
+        if len(out) > 1:
+            heavy.update(out[1].split(","))
+    return timings, sorted(heavy)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    timings, heavy = measure(ENGINE_MODULES, args.runs)
+    median = statistics.median(timings)
+    print(f"Engine import: median {median:.1f} ms, min {min(timings):.1f} ms over {args.runs} cold starts")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: engine import pulled in {', '.join(heavy)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median import time {median:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"OK: within {args.budget_ms:.0f} ms budget")
+    sys.exit(1 if failed else 0)
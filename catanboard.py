@@ -1,8 +1,16 @@
+import heapq
 import numpy as np
 import random
-import networkx as nx
 import math
 
+from player import RESOURCES
+
+
+def pips(frequency):
+    if not frequency:
+        return 0
+    return 6 - abs(7 - frequency)
+
 class Tile:
     def __init__(self, resource, frequency, center, corner_nodes):
         self.resource = resource
@@ -14,7 +22,136 @@ class Tile:
     def get_resource(self):
         return self.resource if self.resource != 'desert' else None
 
+class BoardGraph:
+    def __init__(self):
+        self.nodes = {}
+        self.adj = {}
+        self.graph = {}
+
+    def add_node(self, node, **attr):
+        self.nodes.setdefault(node, {}).update(attr)
+        self.adj.setdefault(node, {})
+
+    def add_edge(self, a, b):
+        for node in (a, b):
+            if node not in self.nodes:
+                self.add_node(node)
+        self.adj[a][b] = True
+        self.adj[b][a] = True
+
+    def add_edges_from(self, edges):
+        for a, b in edges:
+            self.add_edge(a, b)
+
+    def neighbors(self, node):
+        return iter(self.adj[node])
+
+    def has_edge(self, a, b):
+        return a in self.adj and b in self.adj[a]
+
+    @property
+    def edges(self):
+        seen = set()
+        edges = []
+        for node, nbrs in self.adj.items():
+            for nbr in nbrs:
+                if nbr not in seen:
+                    edges.append((node, nbr))
+            seen.add(node)
+        return edges
+
+    def copy(self):
+        other = BoardGraph()
+        other.nodes = {node: dict(attrs) for node, attrs in self.nodes.items()}
+        other.adj = self.adj
+        other.graph = self.graph
+        return other
+
+    def to_networkx(self):
+        import networkx as nx
+
+        graph = nx.Graph()
+        for node, attrs in self.nodes.items():
+            graph.add_node(node, **attrs)
+        graph.add_edges_from(self.edges)
+        return graph
+
+class SiteIndex:
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.heap = [(-float(v), node) for node, v in enumerate(self.values)]
+        heapq.heapify(self.heap)
+
+    def copy(self):
+        other = SiteIndex.__new__(SiteIndex)
+        other.values = self.values
+        other.heap = list(self.heap)
+        return other
+
+    def best(self, open_mask):
+        # sites only ever close, so entries failing the distance rule can be dropped for good
+        heap = self.heap
+        while heap and not open_mask[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][1] if heap else None
+
+    def best_among(self, mask):
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return None
+        return int(candidates[np.argmax(self.values[candidates])])
+
+
+def annotate_sites(G, tiles):
+    num_nodes = len(G.nodes)
+    pip_sum = np.zeros(num_nodes, dtype=np.int64)
+    income = np.zeros((num_nodes, len(RESOURCES)), dtype=np.float64)
+    kinds = [set() for _ in range(num_nodes)]
+    for tile in tiles:
+        resource = tile.get_resource()
+        if resource is None:
+            continue
+        p = pips(tile.frequency)
+        for node_id in tile.corner_nodes:
+            pip_sum[node_id] += p
+            income[node_id, RESOURCES.index(resource)] += p / 36.0
+            kinds[node_id].add(resource)
+
+    diversity = np.array([len(k) for k in kinds], dtype=np.int64)
+    for node_id, attrs in G.nodes.items():
+        attrs['pip_sum'] = int(pip_sum[node_id])
+        attrs['diversity'] = int(diversity[node_id])
+    G.graph['pip_sum'] = pip_sum
+    G.graph['diversity'] = diversity
+    G.graph['expected_income'] = income
+    G.graph['site_value'] = pip_sum + diversity
+
+
 def generate_board():
+    resource_distribution = {
+        'wheat': 4,
+        'sheep': 4,
+        'ore': 3,
+        'brick': 3,
+        'wood': 4,
+        'desert': 1
+    }
+    frequencies = [5, 2, 6, 3, 8, 10, 9, 12, 11, 4, 8, 10, 9, 4, 5, 6, 3, 11]
+
+    resources = []
+    for resource, count in resource_distribution.items():
+        resources.extend([resource] * count)
+
+    random.shuffle(resources)
+    random.shuffle(frequencies)
+
+    layout = []
+    for resource in resources:
+        layout.append((resource, None if resource == 'desert' else frequencies.pop()))
+    return build_board(layout)
+
+
+def build_board(layout):
     def ax_to_cart(q, r, size=1):
         x = size * np.sqrt(3) * (q + r / 2)
         y = size * 1.5 * r
@@ -29,7 +166,7 @@ def generate_board():
     ]
     tile_centers = [ax_to_cart(q, r) for q, r in tile_axial_coords]
 
-    G = nx.Graph()
+    G = BoardGraph()
     node_id = 0
     unique_coords = set()
     corner_list_per_tile = []
@@ -71,27 +208,9 @@ def generate_board():
 
     G.add_edges_from(edges)
 
-    resource_distribution = {
-        'wheat': 4,
-        'sheep': 4,
-        'ore': 3,
-        'brick': 3,
-        'wood': 4,
-        'desert': 1
-    }
-    frequencies = [5, 2, 6, 3, 8, 10, 9, 12, 11, 4, 8, 10, 9, 4, 5, 6, 3, 11]
-
-    resources = []
-    for resource, count in resource_distribution.items():
-        resources.extend([resource] * count)
-
-    random.shuffle(resources)
-    random.shuffle(frequencies)
-
     tiles = []
     for i, center in enumerate(tile_centers):
-        resource = resources[i]
-        frequency = None if resource == 'desert' else frequencies.pop()
+        resource, frequency = layout[i]
         tile = Tile(resource, frequency, center, tile_corner_nodes[i])
         tiles.append(tile)
 
@@ -99,4 +218,5 @@ def generate_board():
         for node_id in tile.corner_nodes:
             G.nodes[node_id]['adjacent_tiles'].append(tile)
 
+    annotate_sites(G, tiles)
     return tiles, G
@@ -0,0 +1,230 @@
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+from collections import deque
+
+import numpy as np
+import torch
+
+from policy import NumpyPolicy
+from replay_memory import CompactReplayMemory
+
+CHECKPOINT_RE = re.compile(r"^checkpoint_(\d+)\.pt$")
+
+
+def _clone(value):
+    if torch.is_tensor(value):
+        return value.detach().clone()
+    if isinstance(value, dict):
+        return type(value)((k, _clone(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return type(value)(_clone(v) for v in value)
+    return value
+
+
+def rng_state():
+    return {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+    }
+
+
+def restore_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+
+
+def write_replay(memory, directory):
+    n = len(memory)
+    state_dim = memory[0][0].shape[0]
+    action_dim = memory[0][6].shape[0]
+
+    def column(name, dtype, shape):
+        return np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode='w+',
+                                         dtype=dtype, shape=shape)
+
+    states = column('states', np.float32, (n, state_dim))
+    next_states = column('next_states', np.float32, (n, state_dim))
+    actions = column('actions', np.int64, (n,))
+    rewards = column('rewards', np.float32, (n,))
+    dones = column('dones', np.bool_, (n,))
+    discounts = column('discounts', np.float32, (n,))
+    next_masks = column('next_masks', np.bool_, (n, action_dim))
+    for i, (state, action, reward, next_state, done, discount, next_mask) in enumerate(memory):
+        states[i] = state.numpy()
+        next_states[i] = next_state.numpy()
+        actions[i] = action
+        rewards[i] = reward
+        dones[i] = done
+        discounts[i] = discount
+        next_masks[i] = next_mask.numpy()
+    for out in (states, next_states, actions, rewards, dones, discounts, next_masks):
+        out.flush()
+
+
+def read_replay(directory, maxlen, gamma, action_dim):
+    # replays written before n-step storage are 1-step transitions with every action legal
+    columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+               for name in ('states', 'actions', 'rewards', 'next_states', 'dones')}
+    n = len(columns['actions'])
+    if os.path.exists(os.path.join(directory, "discounts.npy")):
+        columns['discounts'] = np.load(os.path.join(directory, "discounts.npy"), mmap_mode='r')
+        columns['next_masks'] = np.load(os.path.join(directory, "next_masks.npy"), mmap_mode='r')
+    else:
+        columns['discounts'] = np.full(n, gamma, dtype=np.float32)
+        columns['next_masks'] = np.ones((n, action_dim), dtype=bool)
+    memory = deque(maxlen=maxlen)
+    for i in range(n):
+        memory.append((
+            torch.from_numpy(np.array(columns['states'][i])),
+            int(columns['actions'][i]),
+            float(columns['rewards'][i]),
+            torch.from_numpy(np.array(columns['next_states'][i])),
+            bool(columns['dones'][i]),
+            float(columns['discounts'][i]),
+            torch.from_numpy(np.array(columns['next_masks'][i])),
+        ))
+    return memory
+
+
+class CheckpointManager:
+    def __init__(self, directory, keep_last=3, save_replay=False):
+        if keep_last < 1:
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}")
+        self.directory = directory
+        self.keep_last = keep_last
+        self.save_replay = save_replay
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, agent, episode, extra=None):
+        with agent.paused():
+            state = {
+                'episode': episode,
+                'model': _clone(agent.model.state_dict()),
+                'target_model': _clone(agent.target_model.state_dict()),
+                'optimizer': _clone(agent.optimizer.state_dict()),
+                'epsilon': agent.epsilon,
+                'step_count': agent.step_count,
+                'rng': rng_state(),
+                'extra': _clone(extra or {}),
+            }
+        replay = None
+        if self.save_replay and len(agent.memory):
+            with agent._memory_lock:
+                if isinstance(agent.memory, CompactReplayMemory):
+                    replay = agent.memory.state_dict()
+                else:
+                    replay = list(agent.memory)
+        self._queue.put((episode, state, replay))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+                self._prune()
+            except Exception as e:
+                self.error = e
+                print(f"Checkpoint write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, episode, state, replay):
+        name = f"checkpoint_{episode:06d}"
+        if replay is not None:
+            replay_dir = os.path.join(self.directory, f"{name}.replay")
+            tmp_dir = replay_dir + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            if isinstance(replay, dict):
+                for column, values in replay.items():
+                    np.save(os.path.join(tmp_dir, f"{column}.npy"), values)
+            else:
+                write_replay(replay, tmp_dir)
+            shutil.rmtree(replay_dir, ignore_errors=True)
+            os.replace(tmp_dir, replay_dir)
+            state['replay'] = os.path.basename(replay_dir)
+
+        weights = {k: v.numpy() for k, v in state['model'].items()}
+        NumpyPolicy(weights).save(os.path.join(self.directory, f"{name}.policy.npz"))
+
+        path = os.path.join(self.directory, f"{name}.pt")
+        tmp_path = path + ".tmp"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+        print(f"Saved checkpoint {path}")
+
+    def checkpoints(self):
+        found = []
+        for f in os.listdir(self.directory):
+            match = CHECKPOINT_RE.match(f)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, f)))
+        return [path for _, path in sorted(found)]
+
+    def _prune(self):
+        for path in self.checkpoints()[:-self.keep_last]:
+            os.remove(path)
+            prefix = path[:-len(".pt")]
+            if os.path.exists(prefix + ".policy.npz"):
+                os.remove(prefix + ".policy.npz")
+            shutil.rmtree(prefix + ".replay", ignore_errors=True)
+
+    def latest(self):
+        found = self.checkpoints()
+        return found[-1] if found else None
+
+    def load(self, agent, path=None):
+        path = path or self.latest()
+        if path is None:
+            return None
+        state = torch.load(path, weights_only=False)
+        agent.stop_learner()
+        agent.model.load_state_dict(state['model'])
+        agent.target_model.load_state_dict(state['target_model'])
+        agent.optimizer.load_state_dict(state['optimizer'])
+        agent.epsilon = state['epsilon']
+        agent.step_count = state['step_count']
+        restore_rng_state(state['rng'])
+        agent._sync_policy()
+        if state.get('replay'):
+            replay_dir = os.path.join(os.path.dirname(path), state['replay'])
+            compact = os.path.exists(os.path.join(replay_dir, "positions.npy"))
+            if isinstance(agent.memory, CompactReplayMemory) and compact:
+                columns = {
+                    column[:-len(".npy")]: np.load(os.path.join(replay_dir, column))
+                    for column in os.listdir(replay_dir)
+                }
+                n = len(columns['actions'])
+                columns.setdefault('discounts', np.full(n, agent.gamma, dtype=np.float32))
+                columns.setdefault('next_masks', np.packbits(np.ones((n, agent.action_dim), dtype=bool), axis=1))
+                agent.memory.load_state_dict(columns)
+            elif isinstance(agent.memory, CompactReplayMemory):
+                for obs, action, reward, next_obs, done, discount, next_mask in read_replay(
+                        replay_dir, agent.memory.maxlen, agent.gamma, agent.action_dim):
+                    agent.memory.add(obs.numpy(), action, reward, next_obs.numpy(), done, discount, next_mask.numpy())
+            elif compact:
+                print(f"Skipping compact replay in {replay_dir}: agent uses an uncompressed memory")
+            else:
+                agent.memory = read_replay(replay_dir, agent.memory.maxlen, agent.gamma, agent.action_dim)
+        print(f"Resumed from {path} (episode {state['episode']})")
+        return state
+
+    def wait(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,261 @@
+import argparse
+import io
+import json
+import os
+import pickle
+import queue
+import random
+import threading
+from contextlib import redirect_stdout
+
+import numpy as np
+
+COLUMNS = ('obs', 'actions', 'rewards', 'masks', 'dones')
+INDEX_FILE = "index.json"
+
+
+class TrajectoryWriter:
+    def __init__(self, directory, obs_dim, num_actions, shard_size=65536):
+        self.directory = directory
+        self.obs_dim = obs_dim
+        self.num_actions = num_actions
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.index = self._read_index()
+        self.count = 0
+        self._allocate(shard_size)
+
+    def _read_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+            if index['obs_dim'] != self.obs_dim or index['num_actions'] != self.num_actions:
+                raise ValueError(f"{self.directory} holds a dataset with different dimensions")
+            return index
+        return {'obs_dim': self.obs_dim, 'num_actions': self.num_actions, 'shards': []}
+
+    def _allocate(self, capacity):
+        self.buffers = {
+            'obs': np.zeros((capacity, self.obs_dim), dtype=np.float32),
+            'actions': np.zeros(capacity, dtype=np.int64),
+            'rewards': np.zeros(capacity, dtype=np.float32),
+            'masks': np.zeros((capacity, self.num_actions), dtype=bool),
+            'dones': np.zeros(capacity, dtype=bool),
+        }
+
+    def _grow(self):
+        old, n = self.buffers, self.count
+        self._allocate(2 * len(old['actions']))
+        for name in COLUMNS:
+            self.buffers[name][:n] = old[name][:n]
+
+    def add(self, obs, action, reward, mask, done):
+        if self.count == len(self.buffers['actions']):
+            self._grow()
+        i = self.count
+        self.buffers['obs'][i] = obs
+        self.buffers['actions'][i] = action
+        self.buffers['rewards'][i] = reward
+        self.buffers['masks'][i] = mask
+        self.buffers['dones'][i] = done
+        self.count += 1
+        if done and self.count >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        name = f"shard_{len(self.index['shards']):05d}"
+        tmp_dir = os.path.join(self.directory, name + ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        n = self.count
+        for column in COLUMNS:
+            values = self.buffers[column][:n]
+            if column == 'masks':
+                values = np.packbits(values, axis=1)
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), values)
+        os.replace(tmp_dir, os.path.join(self.directory, name))
+
+        self.index['shards'].append({'name': name, 'length': n})
+        tmp_index = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(tmp_index, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_index, os.path.join(self.directory, INDEX_FILE))
+
+        if len(self.buffers['actions']) > self.shard_size:
+            self._allocate(self.shard_size)
+        self.count = 0
+
+    def close(self):
+        self.flush()
+
+
+class TrajectoryDataset:
+    def __init__(self, directory, batch_size=64, shuffle=True, shuffle_window=8192, prefetch=4, seed=None):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.shuffle_window = shuffle_window
+        self.prefetch = prefetch
+        self.seed = seed
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.num_actions = self.index['num_actions']
+
+    def __len__(self):
+        return sum(shard['length'] for shard in self.index['shards'])
+
+    def _open_shard(self, name):
+        path = os.path.join(self.directory, name)
+        return {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r') for column in COLUMNS}
+
+    def _windows(self, rng):
+        shards = list(self.index['shards'])
+        if self.shuffle:
+            rng.shuffle(shards)
+        for shard in shards:
+            data = self._open_shard(shard['name'])
+            n = shard['length']
+            starts = list(range(0, n, self.shuffle_window))
+            if self.shuffle:
+                rng.shuffle(starts)
+            for start in starts:
+                stop = min(n, start + self.shuffle_window + 1)
+                window = {column: np.array(values[start:stop]) for column, values in data.items()}
+                window['masks'] = np.unpackbits(window['masks'], axis=1, count=self.num_actions).astype(bool)
+                yield window, min(n, start + self.shuffle_window) - start
+
+    def _batches(self, rng):
+        for window, rows in self._windows(rng):
+            order = np.arange(rows)
+            if self.shuffle:
+                rng.shuffle(order)
+            last = len(window['actions']) - 1
+            for i in range(0, rows, self.batch_size):
+                idx = order[i:i + self.batch_size]
+                next_idx = np.minimum(idx + 1, last)
+                next_idx = np.where(window['dones'][idx], idx, next_idx)
+                yield {
+                    'obs': window['obs'][idx],
+                    'actions': window['actions'][idx],
+                    'rewards': window['rewards'][idx],
+                    'masks': window['masks'][idx],
+                    'dones': window['dones'][idx],
+                    'next_obs': window['obs'][next_idx],
+                    'next_masks': window['masks'][next_idx],
+                }
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed)
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for batch in self._batches(rng):
+                    while not stop.is_set():
+                        try:
+                            batches.put(batch, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        return
+            finally:
+                batches.put(done)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done:
+                    return
+                yield batch
+        finally:
+            stop.set()
+
+
+def replay_players(data):
+    if data.get('states'):
+        return list(data['states'][0]['resources'])
+    return ["Red", "Blue"]
+
+
+def import_replay(pickle_path, writer):
+    # nothing is written unless every recorded state is reproduced, so a diverged game
+    # can't contribute transitions from a different game
+    from catanboard import generate_board
+    from environment import CatanEnvironment
+    from game import Game
+    from player import Player
+    from verify_replays import state_difference
+
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    random.seed(data['seed'])
+    np.random.seed(data['seed'])
+    tiles, G = generate_board()
+    env = CatanEnvironment(Game([Player(n) for n in replay_players(data)], tiles, G))
+
+    rows = []
+    actions = data['actions']
+    states = data.get('states', [])
+    with redirect_stdout(io.StringIO()):
+        for i, act in enumerate(actions):
+            if i < len(states):
+                diff = state_difference(states[i], env.game)
+                if diff:
+                    field, expected, actual = diff
+                    raise ValueError(f"{pickle_path} diverges at turn {i + 1}: {field} recorded {expected!r}, "
+                                     f"replayed {actual!r}")
+            obs = env.observe().copy()
+            mask = env.action_mask().copy()
+            idx = env.resolve_action(act)
+            _, reward, done, _ = env.step(act)
+            done = done or i == len(actions) - 1
+            if idx is not None:
+                rows.append((obs, idx, reward, mask, done))
+            if env.game.game_over:
+                break
+    for row in rows:
+        writer.add(*row)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="re-simulate recorded games into a trajectory dataset")
+    imp.add_argument("replays", nargs="+")
+    imp.add_argument("--out", default="trajectories")
+    imp.add_argument("--shard-size", type=int, default=65536)
+    info = sub.add_parser("info", help="summarize a trajectory dataset")
+    info.add_argument("directory")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        from environment import CatanEnvironment
+        from catanboard import generate_board
+        from game import Game
+        from player import Player
+
+        with open(args.replays[0], 'rb') as f:
+            names = replay_players(pickle.load(f))
+        tiles, G = generate_board()
+        probe = CatanEnvironment(Game([Player(n) for n in names], tiles, G))
+        writer = TrajectoryWriter(args.out, probe.game.features.size, len(probe.action_table), args.shard_size)
+        for path in args.replays:
+            try:
+                print(f"{path}: {import_replay(path, writer)} transitions")
+            except ValueError as e:
+                print(f"Skipping {e}")
+        writer.close()
+    else:
+        dataset = TrajectoryDataset(args.directory, shuffle=False)
+        print(f"{len(dataset)} transitions in {len(dataset.index['shards'])} shards "
+              f"(obs_dim={dataset.index['obs_dim']}, actions={dataset.num_actions})")
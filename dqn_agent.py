@@ -1,10 +1,17 @@
+import copy
 import random
+import threading
+import time
 from collections import deque
+from contextlib import contextmanager
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from replay_memory import CompactReplayMemory
+
 
 class QNetwork(nn.Module):
     def __init__(self, state_dim, action_dim):
@@ -19,6 +26,11 @@ class QNetwork(nn.Module):
         return self.fc3(x)
 
 
+def quantize_qnetwork(model):
+    # int8 weights with activations quantized per call; CPU-only, used for acting, never trained
+    return torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+
 class DQNAgent:
     def __init__(
         self,
@@ -32,14 +44,24 @@ class DQNAgent:
         batch_size: int = 64,
         memory_size: int = 10000,
         target_update_every: int = 100,
+        updates_per_batch: int = 1,
+        codec=None,
+        quantize_actor: bool = False,
+        n_step: int = 1,
+        double_dqn: bool = False,
     ):
         self.epsilon       = epsilon
         self.epsilon_min   = epsilon_min
         self.epsilon_decay = epsilon_decay
 
         self.gamma        = gamma
+        self.n_step       = n_step
+        self.double_dqn   = double_dqn
+        self.action_dim   = action_dim
         self.batch_size   = batch_size
-        self.memory       = deque(maxlen=memory_size)
+        self._pending     = []
+        self._all_legal   = torch.ones(action_dim, dtype=torch.bool)
+        self.memory       = deque(maxlen=memory_size) if codec is None else CompactReplayMemory(codec, memory_size, action_dim)
 
         self.model        = QNetwork(state_dim, action_dim)
         self.target_model = QNetwork(state_dim, action_dim)
@@ -48,45 +70,190 @@ class DQNAgent:
 
         self.optimizer            = torch.optim.Adam(self.model.parameters(), lr=lr)
         self.update_target_every  = target_update_every
+        self.updates_per_batch    = updates_per_batch
         self.step_count           = 0
 
-    def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.policy_model    = None
+        self.quantize_actor  = quantize_actor
+        self.actor_model     = None
+        self.replay_ratio    = 1.0
+        self.transitions     = 0
+        self._learner        = None
+        self._stop           = threading.Event()
+        self._memory_lock    = threading.Lock()
+        self._update_lock    = threading.RLock()
+        self._policy_lock    = threading.Lock()
 
-    def replay(self):
-        if len(self.memory) < self.batch_size:
+    def remember(self, state, action, reward, next_state, done, next_mask=None):
+        # transitions wait until n rewards are known (or the episode ends) and are stored with
+        # the discounted n-step return, the bootstrap discount and the legal actions at the end
+        if next_mask is None:
+            next_mask = self._all_legal
+        elif not torch.is_tensor(next_mask):
+            next_mask = torch.from_numpy(np.array(next_mask, dtype=bool))
+        self._pending.append((state, action, reward, next_state, done, next_mask))
+        if done:
+            self._flush(len(self._pending))
+        elif len(self._pending) >= self.n_step:
+            self._flush(1)
+
+    def end_episode(self):
+        # episodes cut off without a terminal state still bootstrap from their last position
+        self._flush(len(self._pending))
+
+    def _flush(self, count):
+        pending = self._pending
+        k = len(pending)
+        if not k:
             return
+        rewards = np.array([t[2] for t in pending], dtype=np.float64)
+        powers = self.gamma ** np.arange(k)
+        _, _, _, next_state, done, next_mask = pending[-1]
+        with self._memory_lock:
+            for i in range(count):
+                state, action = pending[i][0], pending[i][1]
+                ret = float(np.dot(rewards[i:], powers[:k - i]))
+                discount = float(self.gamma ** (k - i))
+                if isinstance(self.memory, CompactReplayMemory):
+                    self.memory.add(state, action, ret, next_state, done, discount, next_mask)
+                else:
+                    self.memory.append((state, action, ret, next_state, done, discount, next_mask))
+                self.transitions += 1
+        del pending[:count]
 
-        batch = random.sample(self.memory, self.batch_size)
-        states, actions, rewards, next_states, dones = zip(*batch)
+    def _sample_batch(self):
+        with self._memory_lock:
+            if len(self.memory) < self.batch_size:
+                return None
+            if isinstance(self.memory, CompactReplayMemory):
+                states, actions, rewards, next_states, dones, discounts, next_masks = self.memory.batch(
+                    random.sample(range(len(self.memory)), self.batch_size))
+                return (torch.from_numpy(states), torch.from_numpy(actions), torch.from_numpy(rewards),
+                        torch.from_numpy(next_states), torch.from_numpy(dones.astype(np.float32)),
+                        torch.from_numpy(discounts), torch.from_numpy(next_masks))
+            batch = random.sample(self.memory, self.batch_size)
+        states, actions, rewards, next_states, dones, discounts, next_masks = zip(*batch)
 
         states      = torch.stack(states)             
         next_states = torch.stack(next_states)
         actions     = torch.tensor(actions, dtype=torch.long)   
         rewards     = torch.tensor(rewards, dtype=torch.float32)
         dones       = torch.tensor(dones, dtype=torch.float32)   
+        discounts   = torch.tensor(discounts, dtype=torch.float32)
+        next_masks  = torch.stack(next_masks)
+        return states, actions, rewards, next_states, dones, discounts, next_masks
+
+    def _next_values(self, next_states, next_masks):
+        # max over the next position's legal actions; Double DQN picks that action with the
+        # online network and scores it with the target network
+        next_q = self.target_model(next_states)
+        if self.double_dqn:
+            online_q = self.model(next_states).masked_fill(~next_masks, -float('inf'))
+            values = next_q.gather(1, online_q.argmax(1, keepdim=True)).squeeze(1)
+        else:
+            values = next_q.masked_fill(~next_masks, -float('inf')).max(1)[0]
+        return torch.where(next_masks.any(1), values, torch.zeros_like(values))
+
+    def _learn(self, batch):
+        states, actions, rewards, next_states, dones, discounts, next_masks = batch
+        with self._update_lock:
+            q_vals = self.model(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+
+            with torch.no_grad():
+                next_q = self._next_values(next_states, next_masks)
+            target = rewards + (1.0 - dones) * discounts * next_q
+
+            loss = F.mse_loss(q_vals, target)
+            self.optimizer.zero_grad()
+            loss.backward()
+            self.optimizer.step()
 
-        q_vals = self.model(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+            self.step_count += 1
+            if self.step_count % self.update_target_every == 0:
+                self.target_model.load_state_dict(self.model.state_dict())
+                self._sync_policy()
 
-        with torch.no_grad():
-            next_q = self.target_model(next_states).max(1)[0]
-        target = rewards + (1.0 - dones) * self.gamma * next_q
+    def replay(self):
+        if self._learner is not None:
+            return
+
+        batch = self._sample_batch()
+        if batch is None:
+            return
+        for _ in range(self.updates_per_batch):
+            self._learn(batch)
+
+    def _sync_policy(self):
+        if self.policy_model is not None:
+            with self._policy_lock:
+                self.policy_model.load_state_dict(self.model.state_dict())
+        # the int8 actor is rebuilt from the float weights on the next action
+        with self._policy_lock:
+            self.actor_model = None
+
+    def load_weights(self, weights):
+        self.model.load_state_dict(weights)
+        self._sync_policy()
+
+    def _actor(self):
+        actor = self.actor_model
+        if actor is None:
+            with self._update_lock, self._policy_lock:
+                if self.actor_model is None:
+                    self.actor_model = quantize_qnetwork(self.model)
+                actor = self.actor_model
+        return actor
+
+    def start_learner(self, replay_ratio=1.0):
+        if self._learner is not None:
+            return
+        self.replay_ratio = replay_ratio
+        self.policy_model = copy.deepcopy(self.model)
+        self.policy_model.eval()
+        self._stop.clear()
+        self._learner = threading.Thread(target=self._learn_loop, daemon=True)
+        self._learner.start()
+
+    def stop_learner(self):
+        if self._learner is None:
+            return
+        self._stop.set()
+        self._learner.join()
+        self._learner = None
+        self.policy_model = None
 
-        loss = F.mse_loss(q_vals, target)
-        self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
+    def _learn_loop(self):
+        start_transitions = self.transitions
+        batches = 0
+        while not self._stop.is_set():
+            allowed = (self.transitions - start_transitions) * self.replay_ratio
+            batch = self._sample_batch() if batches < allowed else None
+            if batch is None:
+                time.sleep(0.001)
+                continue
+            for _ in range(self.updates_per_batch):
+                self._learn(batch)
+            batches += 1
 
-        self.step_count += 1
-        if self.step_count % self.update_target_every == 0:
-            self.target_model.load_state_dict(self.model.state_dict())
+    @contextmanager
+    def paused(self):
+        with self._update_lock:
+            yield
 
-    def select_action(self, state: torch.Tensor, valid_action_indices):
+    def select_action(self, state: torch.Tensor, valid_action_indices, deadline=None):
+        if deadline is not None and time.monotonic() >= deadline:
+            return random.choice(valid_action_indices)
         if random.random() < self.epsilon:
             choice = random.choice(valid_action_indices)
         else:
             with torch.no_grad():
-                q_values = self.model(state.unsqueeze(0)).squeeze(0)
+                if self.quantize_actor:
+                    q_values = self._actor()(state.unsqueeze(0)).squeeze(0)
+                elif self.policy_model is not None:
+                    with self._policy_lock:
+                        q_values = self.policy_model(state.unsqueeze(0)).squeeze(0)
+                else:
+                    q_values = self.model(state.unsqueeze(0)).squeeze(0)
             mask = torch.full_like(q_values, -float('inf'))
             for idx in valid_action_indices:
                 mask[idx] = q_values[idx]
@@ -1,23 +1,71 @@
+import copy
 import random
+from collections.abc import Mapping, Set
+from types import MappingProxyType
+
 import numpy as np
-import torch
-from gym.spaces import Discrete, Box
 
 from game import Game
 from player import Player
 from catanboard import generate_board
+from actions import ActionTable, VERBS
 
-class CatanEnvironment:
-    def __init__(self, game: Game):
-        self.game = game
-        self.actions = ["roll", "pass", "build_settlement", "build_road", "build_city", "bank_trade"]
-        self.action_space = Discrete(len(self.actions))
-        self.observation_space = Box(low=0, high=100, shape=(10,), dtype=np.float32)
+class _SetView(Set):
+    __slots__ = ('_items',)
 
-    def get_state(self):
-        player = self.game.current_player
+    def __init__(self, items):
+        self._items = items
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return repr(self._items)
+
+
+class StateView(Mapping):
+    # read-only view of a player's state, read straight from the engine on access
+    __slots__ = ('player',)
+    FIELDS = ("current_player", "current_seat", "resources", "settlements", "cities", "roads", "victory_points")
+
+    def __init__(self, player):
+        self.player = player
+
+    def __getitem__(self, key):
+        player = self.player
+        if key == "current_player":
+            return player.name
+        if key == "current_seat":
+            return player.seat
+        if key == "resources":
+            return MappingProxyType(player.resources)
+        if key == "settlements":
+            return _SetView(player.settlements)
+        if key == "cities":
+            return _SetView(player.cities)
+        if key == "roads":
+            return _SetView(player.roads)
+        if key == "victory_points":
+            return player.victory_points()
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def freeze(self):
+        player = self.player
         return {
             "current_player": player.name,
+            "current_seat": player.seat,
             "resources": player.resources.copy(),
             "settlements": list(player.settlements),
             "cities": list(player.cities),
@@ -25,6 +73,46 @@ class CatanEnvironment:
             "victory_points": player.victory_points(),
         }
 
+    def __repr__(self):
+        return f"StateView({self.freeze()!r})"
+
+
+class CatanEnvironment:
+    def __init__(self, game: Game, positions=None):
+        self.game = game
+        self.positions = positions
+        self.actions = list(VERBS)
+        self.action_table = ActionTable(game.node_list, game.edge_list)
+        self._mask = np.zeros(len(self.action_table), dtype=bool)
+        self._action_space = None
+        self._observation_space = None
+
+    @property
+    def action_space(self):
+        if self._action_space is None:
+            from gym.spaces import Discrete
+            self._action_space = Discrete(len(self.action_table))
+        return self._action_space
+
+    @property
+    def observation_space(self):
+        if self._observation_space is None:
+            from gym.spaces import Box
+            self._observation_space = Box(low=0, high=100, shape=(self.game.features.size,), dtype=np.float32)
+        return self._observation_space
+
+    def get_state(self):
+        return StateView(self.game.current_player)
+
+    def fork(self, game=None):
+        other = copy.copy(self)
+        other.game = self.game.clone() if game is None else game
+        other._mask = np.zeros_like(self._mask)
+        return other
+
+    def observe(self):
+        return self.game.features.observe(self.game)
+
     def get_valid_actions(self):
         player = self.game.current_player
         if self.game.setup_phase:
@@ -44,56 +132,11 @@ class CatanEnvironment:
             valid.append("pass")
             
             if self.game._can_afford("settlement", player):
-                for node in self.game.G.nodes:
-                    if self.game.G.nodes[node]['occupied_by'] is None:
-                        too_close = any(
-                            self.game.G.nodes[n]['occupied_by'] is not None
-                            for n in self.game.G.neighbors(node)
-                        )
-                        if not too_close:
-                            connected_to_player = any(
-                                node in road for road in player.roads
-                            )
-                            if connected_to_player or not player.roads: 
-                                valid.append("build_settlement")
-                                break
+                if self.game.settlement_sites(player).any():
+                    valid.append("build_settlement")
             
-            if self.game._can_afford("road"):
-                for a, b in self.game.G.edges:
-                    road_exists = False
-                    for game_player in self.game.players:
-                        if (a, b) in game_player.roads or (b, a) in game_player.roads:
-                            road_exists = True
-                            break
-                    
-                    if not road_exists:
-                        connected_to_current_player = (
-                            a in player.settlements or
-                            b in player.settlements or
-                            any(n in (a, b) for r in player.roads for n in r)
-                        )
-                        blocks_other_player = False
-                        for other_player in self.game.players:
-                            if other_player.name != player.name:
-                                if a in other_player.settlements:
-                                    player_has_adjacent_road = any(
-                                        a in road for road in player.roads
-                                    )
-                                    if not player_has_adjacent_road:
-                                        blocks_other_player = True
-                                        break
-                                
-                                if b in other_player.settlements:
-                                    player_has_adjacent_road = any(
-                                        b in road for road in player.roads
-                                    )
-                                    if not player_has_adjacent_road:
-                                        blocks_other_player = True
-                                        break
-                        
-                        if connected_to_current_player and not blocks_other_player:
-                            valid.append("build_road")
-                            break
+            if self.game._can_afford("road") and self._legacy_road_sites(player, True).any():
+                valid.append("build_road")
             
             if self.game._can_afford("city") and player.settlements:
                 valid.append("build_city")
@@ -105,19 +148,94 @@ class CatanEnvironment:
         
         return list(set(valid))
 
+    def action_mask(self):
+        return self.game.action_mask(self.action_table, out=self._mask)
+
+    def valid_action_indices(self):
+        return np.flatnonzero(self.action_mask())
+
+    def resolve_action(self, action):
+        entry = self.action_table.lookup(action)
+        if entry is not None:
+            return self.action_table.index[entry]
+
+        game = self.game
+        player = game.current_player
+        index = self.action_table.index
+        if game.setup_phase:
+            if not game.turn_order_determined:
+                return None
+            status = game.setup_status[player.name]
+            if action == 'build_settlement' and not status['settlement']:
+                node = game.best_settlement_site(player)
+                return None if node is None else index[('build_settlement', node)]
+            if action == 'build_road' and status['settlement'] and not status['road']:
+                start = list(player.settlements)[-1]
+                for nbr in game.neighbors[start]:
+                    if (start, nbr) not in player.roads and (nbr, start) not in player.roads:
+                        return index[('build_road', (start, nbr))]
+            return None
+
+        if action == 'build_settlement' and game._can_afford('settlement'):
+            node = game.best_settlement_site(player)
+            return None if node is None else index[('build_settlement', node)]
+        if action == 'build_road' and game._can_afford('road'):
+            idx = self._first(self._legacy_road_sites(player, False))
+            return None if idx is None else self.action_table.roads.start + idx
+        if action == 'build_city' and game._can_afford('city'):
+            for node in list(player.settlements):
+                return index[('build_city', node)]
+        if action == 'bank_trade':
+            for give, qty in player.resources.items():
+                if qty >= 4:
+                    for receive in player.resources:
+                        if receive != give:
+                            return self.action_table.trade_index[(give, receive)]
+        return None
+
+    def _legacy_road_sites(self, player, allow_through_own_road):
+        game = self.game
+        seat = player.seat
+        settled = (game.node_owner >= 0) & ~game.node_city
+        conn = (settled & (game.node_owner == seat)) | game.road_nodes[seat]
+        blocked = settled & (game.node_owner != seat)
+        if allow_through_own_road:
+            blocked &= ~game.road_nodes[seat]
+        a, b = game.edge_a, game.edge_b
+        return (game.edge_owner == -1) & (conn[a] | conn[b]) & ~blocked[a] & ~blocked[b]
+
     @staticmethod
-    def state_to_tensor(state):
+    def _first(mask):
+        idx = int(mask.argmax())
+        return idx if mask[idx] else None
+
+    @staticmethod
+    def state_to_array(state):
         resource_order = ['wood','brick','sheep','wheat','ore']
-        resource_vec = [state['resources'].get(r,0) for r in resource_order]
-        settlements = len(state['settlements'])
-        cities = len(state['cities'])
-        roads = len(state['roads'])
-        vps = state['victory_points']
-        player_flag = 1 if state['current_player']=='Red' else 0
-        vec = resource_vec + [settlements, cities, roads, vps] + [player_flag]
-        return torch.tensor(vec, dtype=torch.float32)
+        if isinstance(state, StateView):
+            player = state.player
+            resources = player.resources
+            counts = [len(player.settlements), len(player.cities), len(player.roads), player.victory_points()]
+            seat = player.seat
+        else:
+            resources = state['resources']
+            counts = [len(state['settlements']), len(state['cities']), len(state['roads']), state['victory_points']]
+            seat = state['current_seat']
+        resource_vec = [resources.get(r,0) for r in resource_order]
+        player_flag = 1 if seat==0 else 0
+        vec = resource_vec + counts + [player_flag]
+        return np.array(vec, dtype=np.float32)
+
+    @staticmethod
+    def state_to_tensor(state):
+        import torch
+        return torch.from_numpy(CatanEnvironment.state_to_array(state))
 
     def step(self, action):
+        entry = self.action_table.lookup(action)
+        if entry is not None and len(entry) == 1:
+            action, entry = entry[0], None
+
         player = self.game.current_player
         if self.game.setup_phase:
             if not self.game.turn_order_determined:
@@ -129,19 +247,21 @@ class CatanEnvironment:
                         self.game._advance_setup_turn()
                     return self.get_state(),0.0,self.game.game_over,{}
                 return self.get_state(),0.0,self.game.game_over,{}
+            if entry is not None:
+                if self._place_initial_target(player, entry):
+                    return self.get_state(),0.0,self.game.game_over,{}
+                return self.get_state(),-0.2,self.game.game_over,{}
             status=self.game.setup_status[player.name]
             if action=='build_settlement' and not status['settlement']:
-                for node in self.game.G.nodes:
-                    if self.game.G.nodes[node]['occupied_by'] is None:
-                        too_close=any(self.game.G.nodes[n]['occupied_by'] for n in self.game.G.neighbors(node))
-                        if not too_close:
-                            self.game.place_initial(node)
-                            return self.get_state(),0.0,self.game.game_over,{}
+                node=self.game.best_settlement_site(player)
+                if node is not None:
+                    self.game.place_initial(node)
+                    return self.get_state(),0.0,self.game.game_over,{}
             if action=='build_road' and status['settlement'] and not status['road']:
                 start=list(player.settlements)[-1]
-                for nbr in self.game.G.neighbors(start):
+                for nbr in self.game.neighbors[start]:
                     edge=(start,nbr)
-                    if self.game.G.has_edge(*edge) and edge not in player.roads and tuple(reversed(edge)) not in player.roads:
+                    if edge not in player.roads and tuple(reversed(edge)) not in player.roads:
                         self.game.place_initial(edge)
                         return self.get_state(),0.0,self.game.game_over,{}
             self.game._advance_setup_turn()
@@ -151,44 +271,27 @@ class CatanEnvironment:
         prev_settlements=len(player.settlements)
         prev_cities=len(player.cities)
         reward=0.0
-        if action=='roll':
+        if entry is not None:
+            if not self._apply_target(player, entry): reward-=0.2
+        elif action=='roll':
             self.game.roll()
         elif action=='pass':
             self.game.pass_turn()
         elif action=='build_settlement':
             built=False
             if self.game._can_afford('settlement'):
-                for node in self.game.G.nodes:
-                    if self.game.G.nodes[node]['occupied_by'] is None:
-                        too_close=any(self.game.G.nodes[n]['occupied_by'] for n in self.game.G.neighbors(node))
-                        if not too_close:
-                            self.game._handle_settlement_click(node)
-                            built=True
-                            break
+                node=self.game.best_settlement_site(player)
+                if node is not None:
+                    self.game._handle_settlement_click(node)
+                    built=True
             if not built: reward-=0.2
         elif action=='build_road':
             built=False
             if self.game._can_afford('road'):
-                for a,b in self.game.G.edges:
-                    road_exists_for_any_player = False
-                    for game_player in self.game.players:
-                        if (a,b) in game_player.roads or (b,a) in game_player.roads:
-                            road_exists_for_any_player = True
-                            break
-                    
-                    if not road_exists_for_any_player:
-                        conn=(a in player.settlements or b in player.settlements or any(n in (a,b) for r in player.roads for n in r))
-                        connects_to_other_settlement = False
-                        for other_player in self.game.players:
-                            if other_player.name != player.name:
-                                if a in other_player.settlements or b in other_player.settlements:
-                                    connects_to_other_settlement = True
-                                    break
-                        
-                        if conn and not connects_to_other_settlement:
-                            self.game._handle_road_click((a,b))
-                            built=True
-                            break
+                idx=self._first(self._legacy_road_sites(player, False))
+                if idx is not None:
+                    self.game._handle_road_click(self.game.edge_list[idx])
+                    built=True
             if not built: reward-=0.2
         elif action=='build_city':
             built=False
@@ -215,7 +318,7 @@ class CatanEnvironment:
         new_roads=len(player.roads)
         new_settlements=len(player.settlements)
         new_cities=len(player.cities)
-        new_resources=sum(player.resources.values())
+        new_resources=player.card_count()
         build_bonus=(new_roads-prev_roads)*1.0 + (new_settlements-prev_settlements)*2.0 + (new_cities-prev_cities)*3.0
         holding_penalty=0.005*max(0,new_resources-4)
         reward+=(new_vp-prev_vp) + build_bonus - holding_penalty
@@ -223,8 +326,48 @@ class CatanEnvironment:
         reward = max(-3.0, min(reward, 10.0))
         return self.get_state(),reward,self.game.game_over,{}
 
-    def reset(self):
+    def _place_initial_target(self, player, entry):
+        verb = entry[0]
+        if verb == 'build_settlement' and self.game.can_place_settlement(player, entry[1]):
+            self.game.place_initial(entry[1])
+            return True
+        if verb == 'build_road':
+            idx = self.game.edge_index[entry[1]]
+            if self.game.can_place_road(player, idx):
+                self.game.place_initial(self.game.edge_list[idx])
+                return True
+        return False
+
+    def _apply_target(self, player, entry):
+        verb = entry[0]
+        if not self.game.has_rolled[player.name] or self.game.game_over:
+            return False
+        if verb == 'build_settlement':
+            if not self.game.can_place_settlement(player, entry[1]):
+                return False
+            self.game._handle_settlement_click(entry[1])
+            return entry[1] in player.settlements
+        if verb == 'build_road':
+            idx = self.game.edge_index[entry[1]]
+            if not self.game.can_place_road(player, idx):
+                return False
+            self.game._handle_road_click(self.game.edge_list[idx])
+            return self.game.edge_owner[idx] == player.seat
+        if verb == 'build_city':
+            if not self.game.can_place_city(player, entry[1]):
+                return False
+            self.game._handle_city_click(entry[1])
+            return True
+        if verb == 'bank_trade':
+            return self.game.bank_trade(entry[1], entry[2])
+        return False
+
+    def reset(self, position=None):
+        if position is None and self.positions:
+            position=random.choice(self.positions)
+        if position is not None:
+            self.game=Game.from_position(position)
+            return self.get_state()
         tiles,G=generate_board()
-        p1,p2=Player('Red'),Player('Blue')
-        self.game=Game([p1,p2],tiles,G)
+        self.game=Game([Player(p.name) for p in self.game.seat_players],tiles,G)
         return self.get_state()
@@ -1,5 +1,21 @@
+import copy
 import random
-from player import Player 
+import numpy as np
+from catanboard import SiteIndex, annotate_sites, build_board
+from player import Player, RESOURCES
+from observation import BoardFeatures
+
+TILE_CODES = {'wheat': 'w', 'sheep': 's', 'ore': 'o', 'brick': 'b', 'wood': 'l', 'desert': 'd'}
+TILE_RESOURCES = {code: res for res, code in TILE_CODES.items()}
+
+
+def _ints(field):
+    return [int(v) for v in field.split(',')] if field else []
+
+
+def load_positions(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
 
 
 class Game:
@@ -22,15 +38,164 @@ class Game:
         self.visual_mode = False
         self.game_over = False
 
+        for seat, player in enumerate(players):
+            player.seat = seat
+        self.seat_players = list(players)
+        self.node_list = list(graph.nodes)
+        self.edge_list = list(graph.edges)
+        self.edge_index = {}
+        for i, (a, b) in enumerate(self.edge_list):
+            self.edge_index[(a, b)] = i
+            self.edge_index[(b, a)] = i
+        self.tile_index = {tile: i for i, tile in enumerate(tiles)}
+        self.neighbors = {n: list(graph.neighbors(n)) for n in self.node_list}
+        self.node_tiles = {n: [self.tile_index[t] for t in graph.nodes[n]['adjacent_tiles']] for n in self.node_list}
+        self.edge_a = np.array([a for a, _ in self.edge_list], dtype=np.intp)
+        self.edge_b = np.array([b for _, b in self.edge_list], dtype=np.intp)
+
+        self.node_owner = np.full(len(self.node_list), -1, dtype=np.int8)
+        self.node_city = np.zeros(len(self.node_list), dtype=bool)
+        self.node_open = np.ones(len(self.node_list), dtype=bool)
+        self.edge_owner = np.full(len(self.edge_list), -1, dtype=np.int8)
+        self.road_nodes = np.zeros((len(players), len(self.node_list)), dtype=bool)
+        self.tile_weight = np.zeros((len(tiles), len(players)), dtype=np.int16)
+        self.road_length = [0] * len(players)
+        self.features = BoardFeatures(self)
+        if 'site_value' not in graph.graph:
+            annotate_sites(graph, tiles)
+        self.site_index = SiteIndex(graph.graph['site_value'])
+
     COSTS = {
     'settlement': {'wood': 1, 'brick': 1, 'sheep': 1, 'wheat': 1},
     'city': {'wheat': 2, 'ore': 3},
     'road': {'wood': 1, 'brick': 1}
     }
 
+    @classmethod
+    def from_position(cls, text):
+        # "<tiles> <robber> <players> <turn>": tiles as resource code + number joined by '/',
+        # robber tile index or '-', players in seat order as name:hand:settlements:cities:roads
+        # joined by '/', and the turn as the seats in turn order, ':' and the current turn index,
+        # with an 'r' suffix once it has rolled (a bare index keeps the players in listed order)
+        tiles_field, robber, players_field, turn = text.split()
+        layout = []
+        for code in tiles_field.split('/'):
+            layout.append((TILE_RESOURCES[code[0]], int(code[1:]) if code[1:] else None))
+        tiles, G = build_board(layout)
+
+        specs = [spec.split(':') for spec in players_field.split('/')]
+        game = cls([Player(spec[0]) for spec in specs], tiles, G)
+        order, _, index = turn.rpartition(':')
+        if order:
+            game.players = [game.seat_players[seat] for seat in _ints(order)]
+        game.turn_order_determined = True
+        game.setup_phase = False
+        game.setup_stage = 1
+        game.forward_order = False
+        game.setup_placements = {p.name: 2 for p in game.players}
+        for player, (_, hand, settlements, cities, roads) in zip(game.seat_players, specs):
+            for res, count in zip(RESOURCES, _ints(hand)):
+                player.resources[res] = count
+            for node in _ints(settlements):
+                game._add_settlement(player, node)
+            for node in _ints(cities):
+                game._add_settlement(player, node)
+                game._add_city(player, node)
+            for edge in roads.split(',') if roads else []:
+                a, b = edge.split('-')
+                game._add_road(player, (int(a), int(b)))
+
+        if robber != '-':
+            game._move_robber(tiles[int(robber)])
+        game.current_index = int(index.rstrip('r'))
+        game.has_rolled = {p.name: False for p in game.players}
+        game.has_rolled[game.current_player.name] = index.endswith('r')
+        game.update_longest_road()
+        game.check_win_condition()
+        return game
+
+    def to_position(self):
+        if self.setup_phase:
+            raise ValueError("Positions can only be written once setup is complete")
+        tiles = '/'.join(TILE_CODES[t.resource] + str(t.frequency or '') for t in self.tiles)
+        robber = '-' if self.robber_tile is None else str(self.tile_index[self.robber_tile])
+        players = '/'.join(':'.join((
+            p.name,
+            ','.join(str(p.resources[res]) for res in RESOURCES),
+            ','.join(str(n) for n in sorted(p.settlements)),
+            ','.join(str(n) for n in sorted(p.cities)),
+            ','.join(f"{a}-{b}" for a, b in sorted(p.roads)),
+        )) for p in self.seat_players)
+        order = ','.join(str(p.seat) for p in self.players)
+        turn = f"{order}:{self.current_index}{'r' if self.has_rolled[self.current_player.name] else ''}"
+        return ' '.join((tiles, robber, players, turn))
+
+    def clone(self):
+        other = copy.copy(self)
+        other.tiles = [copy.copy(tile) for tile in self.tiles]
+        other.tile_index = {tile: i for i, tile in enumerate(other.tiles)}
+        if self.robber_tile is not None:
+            other.robber_tile = other.tiles[self.tile_index[self.robber_tile]]
+        other.G = self.G.copy()
+        for attrs in other.G.nodes.values():
+            attrs['adjacent_tiles'] = [other.tiles[self.tile_index[t]] for t in attrs['adjacent_tiles']]
+
+        other.players = [player.copy() for player in self.players]
+        other.seat_players = sorted(other.players, key=lambda p: p.seat)
+        other.setup_status = {name: dict(status) for name, status in self.setup_status.items()}
+        other.has_rolled = dict(self.has_rolled)
+        other.turn_order_rolls = dict(self.turn_order_rolls)
+        if hasattr(self, 'setup_placements'):
+            other.setup_placements = dict(self.setup_placements)
+
+        other.node_owner = self.node_owner.copy()
+        other.node_city = self.node_city.copy()
+        other.node_open = self.node_open.copy()
+        other.edge_owner = self.edge_owner.copy()
+        other.road_nodes = self.road_nodes.copy()
+        other.tile_weight = self.tile_weight.copy()
+        other.road_length = list(self.road_length)
+        other.features = self.features.copy()
+        other.site_index = self.site_index.copy()
+        return other
+
     @property
     def current_player(self):
         return self.players[self.current_index]
+
+    def _move_robber(self, tile):
+        old_idx = None
+        if self.robber_tile:
+            self.robber_tile.has_robber = False
+            old_idx = self.tile_index[self.robber_tile]
+            print(f"Robber removed from tile with resource: {self.robber_tile.resource}")
+
+        self.robber_tile = tile
+        self.robber_tile.has_robber = True
+        self.features.move_robber(old_idx, self.tile_index[tile])
+        print(f"Robber moved to tile with resource: {tile.resource}")
+
+    def _add_settlement(self, player, node):
+        player.add_settlement(node)
+        self.G.nodes[node]['occupied_by'] = player.name
+        self.node_owner[node] = player.seat
+        self.node_open[node] = False
+        self.node_open[self.neighbors[node]] = False
+        self.tile_weight[self.node_tiles[node], player.seat] += 1
+        self.features.add_settlement(player.seat, node)
+
+    def _add_city(self, player, node):
+        player.add_city(node)
+        self.G.nodes[node]['is_city'] = True
+        self.node_city[node] = True
+        self.tile_weight[self.node_tiles[node], player.seat] += 1
+        self.features.add_city(player.seat, node)
+
+    def _add_road(self, player, edge):
+        player.add_road(edge)
+        self.edge_owner[self.edge_index[edge]] = player.seat
+        self.road_nodes[player.seat, list(edge)] = True
+        self.features.add_road(player.seat, self.edge_index[edge])
     
     def _handle_robber(self):
         valid_tiles = [t for t in self.tiles if t != self.robber_tile]
@@ -39,25 +204,14 @@ class Game:
             return
         chosen_tile = random.choice(valid_tiles)
         
-        if self.robber_tile:
-            self.robber_tile.has_robber = False
-            print(f"Robber removed from tile with resource: {self.robber_tile.resource}")
-
-        self.robber_tile = chosen_tile
-        self.robber_tile.has_robber = True
-        print(f"Robber moved to tile with resource: {chosen_tile.resource}")
-
-        victims = set()
-        for node_id in chosen_tile.corner_nodes:
-            for player in self.players:
-                if player != self.current_player and (node_id in player.settlements or node_id in player.cities):
-                    victims.add(player)
+        self._move_robber(chosen_tile)
 
+        victims = self.robber_victims(self.tile_index[chosen_tile], self.current_player)
         if victims:
-            victim = random.choice(list(victims))
-            victim_cards = [res for res, count in victim.resources.items() for _ in range(count)]
-            if victim_cards:
-                stolen_resource = random.choice(victim_cards)
+            victim = random.choice(victims)
+            total_cards = victim.card_count()
+            if total_cards:
+                stolen_resource = victim.resource_at(random.randrange(total_cards))
                 victim.resources[stolen_resource] -= 1
                 self.current_player.resources[stolen_resource] += 1
                 print(f"{self.current_player.name} stole 1 {stolen_resource} from {victim.name}")
@@ -68,6 +222,17 @@ class Game:
 
         self.robber_pending = False
 
+    def robber_victims(self, tile_idx, player):
+        weights = self.tile_weight[tile_idx]
+        return [p for p in self.players if p is not player and weights[p.seat]]
+
+    def robber_targets(self, player):
+        weights = self.tile_weight.sum(axis=1) - self.tile_weight[:, player.seat]
+        targets = weights > 0
+        if self.robber_tile is not None:
+            targets[self.tile_index[self.robber_tile]] = False
+        return np.flatnonzero(targets)
+
     def check_win_condition(self):
         for player in self.players:
             if player.victory_points() >= 10:
@@ -97,7 +262,7 @@ class Game:
 
     def _discard_half_resources(self):
         for player in self.players:
-            total_cards = sum(player.resources.values())
+            total_cards = player.card_count()
             if total_cards > 7:
                 to_discard = total_cards // 2
                 print(f"{player.name} has {total_cards} resources and must discard {to_discard}.")
@@ -144,30 +309,42 @@ class Game:
 
         return actions
 
-    def update_longest_road(self):
-        def longest_path_length(player):
-            from networkx import Graph
-
-            road_graph = Graph()
-            for a, b in player.roads:
-                road_graph.add_edge(a, b)
-
-            def dfs(node, visited):
-                visited.add(node)
-                max_length = 0
-                for neighbor in road_graph.neighbors(node):
-                    if neighbor not in visited:
-                        length = 1 + dfs(neighbor, visited.copy())
-                        max_length = max(max_length, length)
-                return max_length
+    @staticmethod
+    def longest_road_length(player):
+        road_graph = {}
+        for a, b in player.roads:
+            road_graph.setdefault(a, []).append(b)
+            road_graph.setdefault(b, []).append(a)
+
+        best = 0
+        visited = set()
+
+        def dfs(node, length):
+            nonlocal best
+            if length > best:
+                best = length
+            visited.add(node)
+            for neighbor in road_graph[node]:
+                if neighbor not in visited:
+                    dfs(neighbor, length + 1)
+            visited.discard(node)
+
+        for node in road_graph:
+            dfs(node, 0)
+            if best == len(player.roads):
+                break
+        return best
 
-            return max((dfs(n, set()) for n in road_graph.nodes), default=0)
+    def update_longest_road(self, changed=None):
+        # only the builder's road network changes, so the other seats keep their cached lengths
+        for player in ([changed] if changed is not None else self.players):
+            self.road_length[player.seat] = self.longest_road_length(player)
 
         max_length = 0
         longest_player = None
 
         for player in self.players:
-            length = longest_path_length(player)
+            length = self.road_length[player.seat]
             if length >= 5 and length > max_length:
                 max_length = length
                 longest_player = player
@@ -178,8 +355,9 @@ class Game:
         if longest_player:
             print(f"{longest_player.name} has the Longest Road ({max_length} segments)")
 
-    def roll(self):
-        roll_val = random.randint(1, 6) + random.randint(1, 6)
+    def roll(self, roll_val=None):
+        if roll_val is None:
+            roll_val = random.randint(1, 6) + random.randint(1, 6)
 
         self.last_roll = roll_val
         
@@ -232,13 +410,16 @@ class Game:
                 if not resource:
                     continue
                 for node_id in tile.corner_nodes:
-                    for player in self.players:
-                        if node_id in player.settlements:
-                            player.add_resource(resource, 1)
-                            print(f"{player.name} receives 1 {resource} from settlement on node {node_id}")
-                        elif node_id in player.cities:
-                            player.add_resource(resource, 2)
-                            print(f"{player.name} receives 2 {resource} from city on node {node_id}")
+                    seat = self.node_owner[node_id]
+                    if seat < 0:
+                        continue
+                    player = self.seat_players[seat]
+                    if self.node_city[node_id]:
+                        player.add_resource(resource, 2)
+                        print(f"{player.name} receives 2 {resource} from city on node {node_id}")
+                    else:
+                        player.add_resource(resource, 1)
+                        print(f"{player.name} receives 1 {resource} from settlement on node {node_id}")
     
     def pass_turn(self):
         if not self.turn_order_determined:
@@ -289,6 +470,93 @@ class Game:
 
     def can_bank_trade(self, player):
         return any(qty >= 4 for qty in player.resources.values())
+
+    def settlement_sites(self, player):
+        if self.setup_phase:
+            return self.node_open
+        return self.node_open & self.road_nodes[player.seat]
+
+    def road_sites(self, player):
+        seat = player.seat
+        free = self.edge_owner == -1
+        own = self.node_owner == seat
+        if self.setup_phase:
+            fresh = own & ~self.road_nodes[seat]
+            return free & (fresh[self.edge_a] | fresh[self.edge_b])
+        reach = own | (self.road_nodes[seat] & (self.node_owner == -1))
+        return free & (reach[self.edge_a] | reach[self.edge_b])
+
+    def best_settlement_site(self, player):
+        if self.setup_phase:
+            return self.site_index.best(self.node_open)
+        return self.site_index.best_among(self.settlement_sites(player))
+
+    def city_sites(self, player):
+        return (self.node_owner == player.seat) & ~self.node_city
+
+    def can_place_settlement(self, player, node):
+        if not self.node_open[node]:
+            return False
+        if self.setup_phase:
+            return self.turn_order_determined and not self.setup_status[player.name]['settlement']
+        return bool(self.road_nodes[player.seat, node]) and self._can_afford('settlement', player)
+
+    def can_place_road(self, player, edge_idx):
+        if self.edge_owner[edge_idx] != -1:
+            return False
+        seat = player.seat
+        ends = (self.edge_a[edge_idx], self.edge_b[edge_idx])
+        if self.setup_phase:
+            status = self.setup_status[player.name]
+            return status['settlement'] and not status['road'] and any(
+                self.node_owner[n] == seat and not self.road_nodes[seat, n] for n in ends
+            )
+        if not self._can_afford('road', player):
+            return False
+        return any(
+            self.node_owner[n] == seat or (self.road_nodes[seat, n] and self.node_owner[n] == -1)
+            for n in ends
+        )
+
+    def can_place_city(self, player, node):
+        return node in player.settlements and self._can_afford('city', player)
+
+    def action_mask(self, table, out=None):
+        mask = np.zeros(len(table), dtype=bool) if out is None else out
+        mask[:] = False
+        if self.game_over:
+            return mask
+
+        player = self.current_player
+        if self.setup_phase:
+            if not self.turn_order_determined:
+                mask[table.roll] = True
+                return mask
+            status = self.setup_status[player.name]
+            if not status['settlement']:
+                mask[table.settlements] = self.settlement_sites(player)
+            elif not status['road']:
+                mask[table.roads] = self.road_sites(player)
+            return mask
+
+        if not self.has_rolled[player.name]:
+            mask[table.roll] = True
+            return mask
+
+        if not self.robber_pending:
+            mask[table.pass_turn] = True
+        if self._can_afford('settlement', player):
+            mask[table.settlements] = self.settlement_sites(player)
+        if self._can_afford('road', player):
+            mask[table.roads] = self.road_sites(player)
+        if self._can_afford('city', player):
+            mask[table.cities] = self.city_sites(player)
+        for give in RESOURCES:
+            if player.resources[give] >= 4:
+                for receive in RESOURCES:
+                    if receive != give:
+                        mask[table.trade_index[(give, receive)]] = True
+        return mask
     
     def _deduct_cost(self, structure):
         for res, amount in self.COSTS[structure].items():
@@ -311,7 +579,7 @@ class Game:
             if self.setup_status[player.name]['road']:
                 print("You've already placed your road.")
                 return
-            player.roads.add((node1, node2))
+            self._add_road(player, (node1, node2))
             print(f"{player.name} placed initial road {node1} ↔ {node2}")
             self.setup_status[player.name]['road'] = True
 
@@ -327,8 +595,7 @@ class Game:
                 if self.G.nodes[neighbor].get('occupied_by') is not None:
                     print("Too close to another settlement.")
                     return
-            player.settlements.add(node)
-            self.G.nodes[node]['occupied_by'] = player.name
+            self._add_settlement(player, node)
             print(f"{player.name} placed initial settlement at {node}")
             self.setup_status[player.name]['settlement'] = True
 
@@ -413,8 +680,7 @@ class Game:
                 return
             
         self._deduct_cost('settlement')
-        self.current_player.settlements.add(node_id)
-        self.G.nodes[node_id]['occupied_by'] = self.current_player.name
+        self._add_settlement(self.current_player, node_id)
         print(f"{self.current_player.name} placed a settlement at node {node_id}")
 
         self.check_win_condition()
@@ -428,9 +694,7 @@ class Game:
             return
         
         self._deduct_cost('city')
-        self.current_player.settlements.remove(node_id)
-        self.current_player.cities.add(node_id)
-        self.G.nodes[node_id]['is_city'] = True
+        self._add_city(self.current_player, node_id)
         print(f"{self.current_player.name} upgraded settlement at node {node_id} to a city.")
 
         self.check_win_condition()
@@ -444,23 +708,19 @@ class Game:
             print("Invalid edge.")
             return
 
-        if edge in self.current_player.roads or tuple(reversed(edge)) in self.current_player.roads:
+        seat = self.current_player.seat
+        if self.edge_owner[self.edge_index[edge]] == seat:
             print("Road already placed.")
             return
         
-        connected = (
-            node1 in self.current_player.settlements or
-            node2 in self.current_player.settlements or
-            any(n in (node1, node2) for road in self.current_player.roads for n in road)
-        )
+        connected = any(self.node_owner[n] == seat or self.road_nodes[seat, n] for n in (node1, node2))
         if not connected:
             print("Road must connect to your existing road or settlement.")
             return
 
         self._deduct_cost('road')
-        self.current_player.roads.add(edge)
+        self._add_road(self.current_player, edge)
         print(f"{self.current_player.name} placed a road between {node1} and {node2}")
         
-        self.current_player.roads.add(edge)
-        self.update_longest_road()
+        self.update_longest_road(self.current_player)
         self.check_win_condition()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import numpy as np
+
+from player import RESOURCE_INDEX
+
+SETTLEMENT_COST = [RESOURCE_INDEX[res] for res in ('wood', 'brick', 'sheep', 'wheat')]
+
+
+class HeuristicBot:
+    # city > settlement > road while expanding, chosen straight off the engine's legal action indices
+    def __init__(self, env, fallback=None, book=None):
+        self.env = env
+        self.fallback = fallback
+        self.book = book
+        self.table = env.action_table
+        self._mask = np.zeros(len(self.table), dtype=bool)
+
+    def select_action(self, state, valid_actions, deadline=None):
+        valid = np.asarray(valid_actions, dtype=np.intp)
+        if len(valid) == 1:
+            return int(valid[0])
+        table = self.table
+        mask = self._mask
+        mask[:] = False
+        mask[valid] = True
+        if mask[table.roll]:
+            return table.roll
+
+        game = self.env.game
+        player = game.current_player
+        if self.book is not None and game.setup_phase:
+            choice = self._opening(game, player, mask)
+            if choice is not None:
+                return choice
+        cities = mask[table.cities]
+        if cities.any():
+            return table.cities.start + game.site_index.best_among(cities)
+        settlements = mask[table.settlements]
+        if settlements.any():
+            return table.settlements.start + game.site_index.best_among(settlements)
+
+        roads = mask[table.roads]
+        if roads.any():
+            hand = player.resources.counts
+            if game.setup_phase or len(player.settlements) < 3 or all(hand[i] for i in SETTLEMENT_COST):
+                return table.roads.start + int(roads.argmax())
+
+        if self.fallback is not None:
+            return self.fallback.select_action(state, valid, deadline)
+
+        trades = np.flatnonzero(mask[table.trades])
+        if len(trades):
+            hand = player.resources
+            entries = [table.entries[table.trades.start + i] for i in trades]
+            k = max(range(len(trades)), key=lambda i: hand[entries[i][1]] - hand[entries[i][2]])
+            return table.trades.start + int(trades[k])
+        return table.pass_turn if mask[table.pass_turn] else int(valid[0])
+
+    def _opening(self, game, player, mask):
+        table = self.table
+        if mask[table.settlements].any():
+            node = self.book.settlement(game)
+            return None if node is None else table.index[('build_settlement', node)]
+        placed = [n for n in player.settlements if not game.road_nodes[player.seat, n]]
+        edge = self.book.road(game, placed[0]) if placed else None
+        return None if edge is None else table.index[('build_road', edge)]
@@ -0,0 +1,66 @@
+import bisect
+import time
+
+import numpy as np
+
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class LatencyRecorder:
+    def __init__(self, name=""):
+        self.name = name
+        self.samples = []
+        self.misses = 0
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+
+    def record(self, seconds, missed=False):
+        ms = seconds * 1000.0
+        self.samples.append(ms)
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        if missed:
+            self.misses += 1
+
+    def merge(self, other):
+        self.samples.extend(other.samples)
+        self.misses += other.misses
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def summary(self):
+        if not self.samples:
+            return {'moves': 0, 'misses': 0}
+        p50, p95, p99 = np.percentile(self.samples, [50, 95, 99])
+        return {
+            'moves': len(self.samples),
+            'misses': self.misses,
+            'mean_ms': float(np.mean(self.samples)),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': float(max(self.samples)),
+        }
+
+    def format_summary(self):
+        s = self.summary()
+        if not s['moves']:
+            return f"{self.name}: no moves"
+        return (f"{self.name}: {s['moves']} moves, {s['misses']} deadline misses, "
+                f"p50 {s['p50_ms']:.2f}ms p95 {s['p95_ms']:.2f}ms p99 {s['p99_ms']:.2f}ms max {s['max_ms']:.2f}ms")
+
+    def format_histogram(self, width=40):
+        peak = max(self.counts) or 1
+        lines = []
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            label = f"<= {BUCKETS_MS[i]:g}ms" if i < len(BUCKETS_MS) else f"> {BUCKETS_MS[-1]:g}ms"
+            lines.append(f"  {label:>10s} |{'#' * max(1, count * width // peak):<{width}s} {count}")
+        return "\n".join(lines)
+
+
+def timed_select(recorder, budget, select, *args):
+    start = time.monotonic()
+    deadline = None if budget is None else start + budget
+    choice = select(*args, deadline)
+    elapsed = time.monotonic() - start
+    recorder.record(elapsed, deadline is not None and elapsed > budget)
+    return choice
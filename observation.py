@@ -0,0 +1,179 @@
+import copy
+
+import numpy as np
+
+from catanboard import pips
+from player import RESOURCES
+
+TILE_TYPES = RESOURCES + ('desert',)
+PUBLIC_FIELDS = ('cards', 'settlements', 'cities', 'roads', 'victory_points', 'longest_road')
+
+
+class BoardFeatures:
+    def __init__(self, game):
+        self.num_players = len(game.players)
+        self.num_nodes = len(game.node_list)
+        self.num_edges = len(game.edge_list)
+        self.num_tiles = len(game.tiles)
+
+        P, N, E, T = self.num_players, self.num_nodes, self.num_edges, self.num_tiles
+        layout = [
+            ('node_occupancy', (P, N)),
+            ('node_city', (N,)),
+            ('edge_roads', (P, E)),
+            ('tile_resource', (T, len(TILE_TYPES))),
+            ('tile_pips', (T,)),
+            ('tile_robber', (T,)),
+            ('hand', (len(RESOURCES),)),
+            ('player_public', (P, len(PUBLIC_FIELDS))),
+            ('current_seat', (P,)),
+            ('phase', (2,)),
+        ]
+        self.layout = layout
+        self.size = sum(int(np.prod(shape)) for _, shape in layout)
+        self._bind(np.zeros(self.size, dtype=np.float32))
+
+        for i, tile in enumerate(game.tiles):
+            self.tile_resource[i, TILE_TYPES.index(tile.resource)] = 1.0
+            self.tile_pips[i] = pips(tile.frequency) / 5.0
+            if tile.has_robber:
+                self.tile_robber[i] = 1.0
+
+    def _bind(self, buffer):
+        self.buffer = buffer
+        self.offsets = {}
+        offset = 0
+        for name, shape in self.layout:
+            length = int(np.prod(shape))
+            self.offsets[name] = (offset, offset + length)
+            setattr(self, name, self.buffer[offset:offset + length].reshape(shape))
+            offset += length
+
+    def copy(self):
+        other = copy.copy(self)
+        other._bind(self.buffer.copy())
+        return other
+
+    def add_settlement(self, seat, node):
+        self.node_occupancy[seat, node] = 1.0
+
+    def add_city(self, seat, node):
+        self.node_occupancy[seat, node] = 1.0
+        self.node_city[node] = 1.0
+
+    def add_road(self, seat, edge_idx):
+        self.edge_roads[seat, edge_idx] = 1.0
+
+    def move_robber(self, old_idx, new_idx):
+        if old_idx is not None:
+            self.tile_robber[old_idx] = 0.0
+        self.tile_robber[new_idx] = 1.0
+
+    def sync_players(self, game):
+        current = game.current_player
+        for i, res in enumerate(RESOURCES):
+            self.hand[i] = current.resources[res]
+
+        for player in game.players:
+            row = self.player_public[player.seat]
+            row[0] = player.card_count()
+            row[1] = len(player.settlements)
+            row[2] = len(player.cities)
+            row[3] = len(player.roads)
+            row[4] = player.victory_points()
+            row[5] = 1.0 if player.has_longest_road else 0.0
+
+        self.current_seat[:] = 0.0
+        self.current_seat[current.seat] = 1.0
+        self.phase[0] = 1.0 if game.setup_phase else 0.0
+        self.phase[1] = 1.0 if game.has_rolled.get(current.name) else 0.0
+
+    def observe(self, game):
+        self.sync_players(game)
+        return self.buffer
+
+
+class PositionCodec:
+    def __init__(self, features):
+        self.size = features.size
+        self.num_players = P = features.num_players
+        self.num_nodes = N = features.num_nodes
+        self.num_edges = E = features.num_edges
+        self.slices = {name: (slice(a, b), dict(features.layout)[name])
+                       for name, (a, b) in features.offsets.items()}
+        self.board_slice = slice(features.offsets['tile_resource'][0], features.offsets['tile_pips'][1])
+
+        self.dtype = np.dtype([
+            ('board', np.uint32),
+            ('node_owner', np.int8, (N,)),
+            ('node_city', np.uint8, ((N + 7) // 8,)),
+            ('roads', np.uint8, (P, (E + 7) // 8)),
+            ('robber', np.int8),
+            ('hand', np.uint16, (len(RESOURCES),)),
+            ('public', np.uint16, (P, len(PUBLIC_FIELDS))),
+            ('seat', np.uint8),
+            ('phase', np.uint8),
+        ])
+        self.boards = []
+        self._board_ids = {}
+        self._board_table = None
+
+    def _view(self, obs, name):
+        where, shape = self.slices[name]
+        return obs[..., where].reshape(obs.shape[:-1] + shape)
+
+    def board_id(self, board):
+        key = board.tobytes()
+        board_id = self._board_ids.get(key)
+        if board_id is None:
+            board_id = self._board_ids[key] = len(self.boards)
+            self.boards.append(board.copy())
+            self._board_table = None
+        return board_id
+
+    def load_boards(self, boards):
+        self.boards = []
+        self._board_ids = {}
+        self._board_table = None
+        for board in boards:
+            self.board_id(np.asarray(board, dtype=np.float32))
+
+    def encode(self, obs, records, i):
+        obs = np.asarray(obs, dtype=np.float32)
+        occupancy = self._view(obs, 'node_occupancy')
+        records['board'][i] = self.board_id(obs[self.board_slice])
+        records['node_owner'][i] = np.where(occupancy.any(axis=0), occupancy.argmax(axis=0), -1)
+        records['node_city'][i] = np.packbits(self._view(obs, 'node_city') > 0)
+        records['roads'][i] = np.packbits(self._view(obs, 'edge_roads') > 0, axis=1)
+        robber = self._view(obs, 'tile_robber')
+        records['robber'][i] = robber.argmax() if robber.any() else -1
+        records['hand'][i] = self._view(obs, 'hand')
+        records['public'][i] = self._view(obs, 'player_public')
+        records['seat'][i] = self._view(obs, 'current_seat').argmax()
+        phase = self._view(obs, 'phase')
+        records['phase'][i] = int(phase[0] > 0) | int(phase[1] > 0) << 1
+
+    def decode(self, records):
+        B = len(records)
+        out = np.zeros((B, self.size), dtype=np.float32)
+        rows = np.arange(B)
+
+        if self._board_table is None:
+            self._board_table = np.stack(self.boards)
+        out[:, self.board_slice] = self._board_table[records['board']]
+
+        occupancy = self._view(out, 'node_occupancy')
+        occupancy[:] = records['node_owner'][:, None, :] == np.arange(self.num_players)[None, :, None]
+        self._view(out, 'node_city')[:] = np.unpackbits(records['node_city'], axis=1, count=self.num_nodes)
+        self._view(out, 'edge_roads')[:] = np.unpackbits(records['roads'], axis=2, count=self.num_edges)
+
+        robber = records['robber'].astype(np.intp)
+        placed = robber >= 0
+        self._view(out, 'tile_robber')[rows[placed], robber[placed]] = 1.0
+        self._view(out, 'hand')[:] = records['hand']
+        self._view(out, 'player_public')[:] = records['public']
+        self._view(out, 'current_seat')[rows, records['seat']] = 1.0
+        phase = self._view(out, 'phase')
+        phase[:, 0] = records['phase'] & 1
+        phase[:, 1] = records['phase'] >> 1
+        return out
@@ -0,0 +1,203 @@
+import argparse
+import dbm
+import hashlib
+import io
+import json
+import math
+import random
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from catanboard import build_board, generate_board
+from environment import CatanEnvironment
+from game import Game, TILE_CODES
+from heuristicBot import HeuristicBot
+from player import make_players
+
+_SYMMETRIES = None
+
+
+def _nearest(points, targets):
+    return np.linalg.norm(points[:, None, :] - targets[None, :, :], axis=2).argmin(axis=1)
+
+
+def symmetries():
+    # tile and node permutations for the 12 symmetries of the hexagonal board
+    # (6 rotations about the centre tile, each with and without a mirror)
+    global _SYMMETRIES
+    if _SYMMETRIES is None:
+        tiles, G = build_board([('desert', None)] * 19)
+        centers = np.array([t.center for t in tiles], dtype=np.float64)
+        corners = np.array([G.nodes[n]['coordinates'] for n in range(len(G.nodes))], dtype=np.float64)
+        _SYMMETRIES = []
+        for k in range(6):
+            angle = math.radians(60 * k)
+            rotate = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+            for mirror in (np.eye(2), np.diag([1.0, -1.0])):
+                transform = rotate @ mirror
+                _SYMMETRIES.append((_nearest(centers @ transform.T, centers),
+                                    _nearest(corners @ transform.T, corners)))
+    return _SYMMETRIES
+
+
+def board_layout(tiles):
+    return [(t.resource, t.frequency) for t in tiles]
+
+
+def canonical_board(layout):
+    # (key, node map into the canonical frame): the key is the same for all 12 images of a board
+    best = None
+    for tile_perm, node_perm in symmetries():
+        image = [None] * len(layout)
+        for i, j in enumerate(tile_perm):
+            image[j] = layout[i]
+        text = '/'.join(TILE_CODES[res] + str(freq or '') for res, freq in image)
+        if best is None or text < best[0]:
+            best = (text, node_perm)
+    text, node_perm = best
+    return hashlib.sha1(text.encode()).hexdigest()[:20], node_perm
+
+
+def expansion_road(game, node):
+    # the road out of node toward the best site two steps away
+    values = game.site_index.values
+    blocked = set(game.neighbors[node]) | {node}
+    best = None
+    for nbr in game.neighbors[node]:
+        reach = [values[n] for n in game.neighbors[nbr] if n not in blocked]
+        score = max(reach, default=-1.0)
+        if best is None or score > best[0]:
+            best = (score, (node, nbr))
+    return best[1]
+
+
+def rollout_value(layout, node, rollouts, depth, seed):
+    # mean VP after depth heuristic-play moves when the first player to place opens on node
+    saved = random.getstate(), np.random.get_state()
+    total = 0.0
+    try:
+        for r in range(rollouts):
+            random.seed(seed + r)
+            np.random.seed(seed + r)
+            tiles, G = build_board(layout)
+            env = CatanEnvironment(Game(make_players(2), tiles, G))
+            bot = HeuristicBot(env)
+            with redirect_stdout(io.StringIO()):
+                while not env.game.turn_order_determined:
+                    env.step(env.action_table.roll)
+                hero = env.game.current_player.seat
+                env.step(env.action_table.index[('build_settlement', node)])
+                for _ in range(depth):
+                    if env.game.game_over:
+                        break
+                    env.step(bot.select_action(None, env.valid_action_indices()))
+            total += env.game.seat_players[hero].victory_points()
+    finally:
+        random.setstate(saved[0])
+        np.random.set_state(saved[1])
+    return total / rollouts
+
+
+def compute_openings(game, size=12, rollouts=0, candidates=8, depth=200, seed=0):
+    # ranked (settlement, road) pairs for an empty board; rollouts re-rank the top candidates
+    values = game.site_index.values
+    order = [int(n) for n in np.argsort(-values, kind='stable')[:max(size, candidates)]]
+    if rollouts:
+        layout = board_layout(game.tiles)
+        scored = {n: rollout_value(layout, n, rollouts, depth, seed) for n in order[:candidates]}
+        order = sorted(order[:candidates], key=lambda n: -scored[n]) + order[candidates:]
+    return [(n, expansion_road(game, n)) for n in order[:size]]
+
+
+class OpeningBook:
+    # canonical board hash -> ranked openings, in a dbm file behind an in-memory LRU
+    def __init__(self, path, capacity=1024, size=12, rollouts=0, depth=200):
+        self.path = path
+        self.capacity = capacity
+        self.size = size
+        self.rollouts = rollouts
+        self.depth = depth
+        self.cache = OrderedDict()
+        self.hits = self.loads = self.computed = 0
+        self.db = dbm.open(path, 'c')
+
+    def close(self):
+        self.db.close()
+
+    def _board(self, game):
+        # the canonical key and node maps only depend on the board, so they live with it
+        board = game.G.graph.get('opening_key')
+        if board is None:
+            key, node_perm = canonical_board(board_layout(game.tiles))
+            board = game.G.graph['opening_key'] = (key, node_perm, np.argsort(node_perm))
+        return board
+
+    def _get(self, key):
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry
+        raw = self.db.get(key)
+        if raw is None:
+            return None
+        self.loads += 1
+        return self._put(key, [(n, tuple(e)) for n, e in json.loads(raw)])
+
+    def _put(self, key, entry):
+        self.cache[key] = entry
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        return entry
+
+    def openings(self, game):
+        # ranked (node, edge) pairs in the game's own node ids, kept on the board after the first lookup
+        mapped = game.G.graph.get('openings')
+        if mapped is not None:
+            self.hits += 1
+            return mapped
+        key, node_perm, inverse = self._board(game)
+        entry = self._get(key)
+        if entry is None:
+            opened = compute_openings(game, self.size, self.rollouts, depth=self.depth)
+            entry = [(int(node_perm[n]), (int(node_perm[a]), int(node_perm[b]))) for n, (a, b) in opened]
+            self.db[key] = json.dumps(entry)
+            self.computed += 1
+            self._put(key, entry)
+        mapped = game.G.graph['openings'] = [
+            (int(inverse[n]), (int(inverse[a]), int(inverse[b]))) for n, (a, b) in entry
+        ]
+        return mapped
+
+    def settlement(self, game):
+        for node, _ in self.openings(game):
+            if game.node_open[node]:
+                return node
+        return None
+
+    def road(self, game, node):
+        for opening, (a, b) in self.openings(game):
+            if opening == node and game.edge_owner[game.edge_index[(a, b)]] == -1:
+                return a, b
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--book", default="openings.db")
+    parser.add_argument("--boards", type=int, default=100, help="seeded boards to precompute")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rollouts", type=int, default=0, help="rollouts per candidate site (0: site values only)")
+    parser.add_argument("--depth", type=int, default=200)
+    args = parser.parse_args()
+
+    book = OpeningBook(args.book, rollouts=args.rollouts, depth=args.depth)
+    for b in range(args.boards):
+        random.seed(args.seed + b)
+        np.random.seed(args.seed + b)
+        tiles, G = generate_board()
+        book.openings(Game(make_players(2), tiles, G))
+    print(f"{args.boards} boards: {book.computed} computed, {book.hits + book.loads} already in {args.book}")
+    book.close()
@@ -0,0 +1,133 @@
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from player import Player
+
+DICE_SUMS = range(2, 13)
+
+# name -> (seed, plies played after the turn-order rolls, default depth), or
+# (Game.to_position text, None, default depth) for a position loaded as written
+POSITIONS = {
+    'setup': (1, 0, 3),
+    'opening': (2, 8, 5),
+    'midgame': (3, 40, 5),
+    'builder': ("s9/s5/s10/w4/b5/b11/w2/o4/s8/l3/w11/w8/o3/b12/o6/l10/d/l6/l9 15 "
+                "Red:2,2,4,1,2:45:28:22-28,28-34,29-34,35-40,40-45/"
+                "Blue:0,0,2,0,3::30,53:29-35,30-35,30-36,50-53 0,1:0r", None, 4),
+}
+
+# (position, depth) -> leaf count; regenerate with --print-golden after an intended rules change
+GOLDEN = {
+    ('setup', 1): 54,
+    ('setup', 2): 144,
+    ('setup', 3): 7236,
+    ('opening', 1): 11,
+    ('opening', 2): 11,
+    ('opening', 3): 121,
+    ('opening', 4): 121,
+    ('opening', 5): 1331,
+    ('midgame', 1): 11,
+    ('midgame', 2): 15,
+    ('midgame', 3): 132,
+    ('midgame', 4): 190,
+    ('midgame', 5): 1470,
+    ('builder', 1): 15,
+    ('builder', 2): 113,
+    ('builder', 3): 451,
+    ('builder', 4): 1631,
+}
+
+
+def start_position(seed, plies):
+    if plies is None:
+        return CatanEnvironment(Game.from_position(seed))
+    random.seed(seed)
+    np.random.seed(seed)
+    rng = random.Random(seed)
+    tiles, G = generate_board()
+    env = CatanEnvironment(Game([Player("Red"), Player("Blue")], tiles, G))
+    game = env.game
+    while not game.turn_order_determined:
+        env.step('roll')
+    for _ in range(plies):
+        if game.game_over:
+            break
+        legal = np.flatnonzero(env.action_mask())
+        env.step(int(legal[rng.randrange(len(legal))]))
+    return env
+
+
+def perft(env, depth, stats):
+    game = env.game
+    stats['nodes'] += 1
+    if depth == 0 or game.game_over:
+        return 1
+
+    table = env.action_table
+    chance_roll = game.turn_order_determined and not game.setup_phase
+    total = 0
+    for idx in np.flatnonzero(game.action_mask(table)):
+        idx = int(idx)
+        if idx == table.roll and chance_roll:
+            for roll_val in DICE_SUMS:
+                child = game.clone()
+                random.seed(roll_val)
+                child.roll(roll_val=roll_val)
+                env.game = child
+                total += perft(env, depth - 1, stats)
+        else:
+            child = game.clone()
+            env.game = child
+            random.seed(idx)
+            env.step(idx)
+            total += perft(env, depth - 1, stats)
+    env.game = game
+    return total
+
+
+def run(name, depth):
+    stats = {'nodes': 0}
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        seed, plies, _ = POSITIONS[name]
+        env = start_position(seed, plies)
+        start = time.perf_counter()
+        leaves = perft(env, depth, stats)
+    return leaves, stats['nodes'], time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", nargs="+", default=list(POSITIONS), choices=list(POSITIONS))
+    parser.add_argument("--depth", type=int, help="maximum depth (default: per position)")
+    parser.add_argument("--verify", action="store_true", help="fail if a count differs from GOLDEN")
+    parser.add_argument("--print-golden", action="store_true")
+    args = parser.parse_args()
+
+    failures = 0
+    golden = {}
+    for name in args.positions:
+        for depth in range(1, (args.depth or POSITIONS[name][2]) + 1):
+            leaves, nodes, elapsed = run(name, depth)
+            golden[(name, depth)] = leaves
+            expected = GOLDEN.get((name, depth))
+            status = ""
+            if expected is not None:
+                status = "ok" if leaves == expected else f"MISMATCH (expected {expected})"
+                failures += leaves != expected
+            print(f"{name:8s} depth {depth}: {leaves:10d} leaves {nodes:10d} nodes "
+                  f"{elapsed:8.3f}s {nodes / max(elapsed, 1e-9):10.0f} nodes/s {status}")
+
+    if args.print_golden:
+        for key, leaves in golden.items():
+            print(f"    {key!r}: {leaves},")
+    if args.verify and failures:
+        sys.exit(1)
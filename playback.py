@@ -1,23 +1,20 @@
 import argparse
 import pickle
 import random
-import torch
 import math
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import networkx as nx
-from matplotlib.animation import FFMpegWriter, PillowWriter
-from collections import OrderedDict
 from io import StringIO
 import sys
 
 from catanboard import generate_board
 from game import Game
-from player import Player
+from player import Player, make_players
 from environment import CatanEnvironment
-from dqn_agent import DQNAgent
+from dataset import replay_players
+from heuristicBot import HeuristicBot
+from latency import LatencyRecorder, timed_select
+from policy import NumpyPolicy
 
 resource_colors = {
     'wheat': '#F9DC5C',
@@ -30,116 +27,68 @@ resource_colors = {
 
 player_colors = {
     'Red': '#FF0000',
-    'Blue': '#0000FF'
+    'Blue': '#0000FF',
+    'White': '#FFFFFF',
+    'Orange': '#FF8C00'
 }
 
-def load_agent(model_path):
-    agent = DQNAgent(state_dim=10, action_dim=6, epsilon=0.0, epsilon_min=0.0)
-    raw = torch.load(model_path)
-    km = {
-        "0.weight": "fc1.weight", "0.bias": "fc1.bias",
-        "2.weight": "fc2.weight", "2.bias": "fc2.bias",
-        "4.weight": "fc3.weight", "4.bias": "fc3.bias"
+def load_agent(model_path, quantized=False):
+    if quantized:
+        from quantize import QuantizedPolicy
+        return QuantizedPolicy.load(model_path)
+    return NumpyPolicy.load(model_path)
+
+class VerbFallback:
+    # the shipped checkpoint scores the six coarse verbs from the legacy 10-dim state
+    def __init__(self, env, agent, latency, budget):
+        self.env = env
+        self.agent = agent
+        self.latency = latency
+        self.budget = budget
+
+    def select_action(self, state, valid_actions, deadline=None):
+        env = self.env
+        idxs = [env.actions.index(a) for a in env.get_valid_actions()]
+        choice = timed_select(self.latency, self.budget, self.agent.select_action,
+                              env.state_to_array(env.get_state()), idxs)
+        idx = env.resolve_action(env.actions[choice])
+        return env.action_table.pass_turn if idx is None else idx
+
+def record_state(game):
+    robber_pos = next((i for i, t in enumerate(game.tiles) if t.has_robber), None)
+    return {
+        'resources': {p.name: dict(p.resources) for p in game.players},
+        'buildings': {p.name: {
+            'settlements': list(p.settlements),
+            'roads': list(p.roads),
+            'cities': list(getattr(p, 'cities', []))
+        } for p in game.players},
+        'robber': robber_pos,
+        'current': game.current_player.name
     }
-    mapped = OrderedDict((km[k], v) for k, v in raw.items() if k in km)
-    agent.model.load_state_dict(mapped)
-    agent.model.eval()
-    return agent
 
-def simulate_and_record(actions_out, max_moves=1000, model_path="dqnCatan.pth"):
+def simulate_and_record(actions_out, max_moves=1000, model_path="dqnCatan.pth", num_players=2, move_budget_ms=None,
+                        quantized=False):
     seed = random.randint(0, 10**6)
     random.seed(seed)
     np.random.seed(seed)
-    torch.manual_seed(seed)
 
-    red_agent = load_agent(model_path)
-    blue_agent = load_agent(model_path)
+    agent = load_agent(model_path, quantized)
     tiles, G = generate_board()
-    game = Game([Player("Red"), Player("Blue")], tiles, G)
+    game = Game(make_players(num_players), tiles, G)
     game.visual_mode = False
     env = CatanEnvironment(game)
+    budget = move_budget_ms / 1000.0 if move_budget_ms else None
+    latency = LatencyRecorder("policy")
 
     actions = []
     logs = []
     states = []
 
+    bot = HeuristicBot(env, fallback=VerbFallback(env, agent, latency, budget))
     for turn in range(1, max_moves + 1):
-        robber_pos = next((i for i, t in enumerate(tiles) if t.has_robber), None)
-        
-        pre_state = {
-            'resources': {p.name: dict(p.resources) for p in game.players},
-            'buildings': {p.name: {
-                'settlements': list(p.settlements),
-                'roads': list(p.roads),
-                'cities': list(getattr(p, 'cities', []))
-            } for p in game.players},
-            'robber': robber_pos,
-            'current': game.current_player.name
-        }
-        states.append(pre_state)
-
-        current = game.current_player.name
-        valid = env.get_valid_actions()
-
-        if game.setup_phase:
-            act = random.choice(valid)
-        elif game.robber_pending:
-            valid_robber_tiles = []
-            current_player = game.current_player
-            
-            for i, tile in enumerate(tiles):
-                if tile == game.robber_tile:
-                    continue 
-                
-                for node_id in tile.corner_nodes:
-                    for player in game.players:
-                        if player != current_player and (node_id in player.settlements or node_id in player.cities):
-                            valid_robber_tiles.append(i)
-                            break
-                    else:
-                        continue
-                    break
-            
-            if valid_robber_tiles:
-                tile_idx = random.choice(valid_robber_tiles)
-                act = f"move_robber {tile_idx}"
-            else:
-                act = "pass"
-        elif not game.has_rolled[current]:
-            act = "roll"
-        else:
-            cities = [a for a in valid if "build_city" in a]
-            if cities:
-                act = cities[0]
-            else:
-                settlements = [a for a in valid if "build_settlement" in a]
-                if settlements:
-                    act = settlements[0]
-                else:
-                    strategic_roads = []
-                    roads = [a for a in valid if "build_road" in a]
-                    
-                    if roads:
-                        current_player = game.current_player
-                        num_settlements = len(current_player.settlements)
-                        player_resources = current_player.resources
-                        can_afford_settlement_soon = (
-                            player_resources.get('wood', 0) >= 1 and
-                            player_resources.get('brick', 0) >= 1 and
-                            player_resources.get('wheat', 0) >= 1 and
-                            player_resources.get('sheep', 0) >= 1
-                        )
-                        
-                        if num_settlements < 3 or can_afford_settlement_soon:
-                            strategic_roads = roads
-                    
-                    if strategic_roads:
-                        act = strategic_roads[0]
-                    else:
-                        idxs = [env.actions.index(a) for a in valid]
-                        agent = red_agent if current == "Red" else blue_agent
-                        choice = agent.select_action(env.state_to_tensor(env.get_state()), idxs)
-                        act = env.actions[choice]
+        states.append(record_state(game))
+        act = env.action_table.names[bot.select_action(None, env.valid_action_indices())]
 
         old_stdout = sys.stdout
         sys.stdout = mystdout = StringIO()
@@ -153,6 +102,7 @@ def simulate_and_record(actions_out, max_moves=1000, model_path="dqnCatan.pth"):
         if game.game_over:
             break
 
+    print(latency.format_summary())
     with open(actions_out, 'wb') as f:
         pickle.dump({
             'actions': actions,
@@ -165,16 +115,20 @@ def simulate_and_record(actions_out, max_moves=1000, model_path="dqnCatan.pth"):
     return actions, {p.name: p.victory_points() for p in game.players}
 
 def playback_and_export(pickle_path, output, fps=30, render_every=1):
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    import networkx as nx
+    from matplotlib.animation import FFMpegWriter, PillowWriter
+
     with open(pickle_path, 'rb') as f:
         data = pickle.load(f)
 
     seed = data['seed']
     random.seed(seed)
     np.random.seed(seed)
-    torch.manual_seed(seed)
 
     tiles, G = generate_board()
-    game = Game([Player("Red"), Player("Blue")], tiles, G)
+    game = Game([Player(n) for n in replay_players(data)], tiles, G)
     game.visual_mode = False
     env = CatanEnvironment(game)
 
@@ -184,7 +138,8 @@ def playback_and_export(pickle_path, output, fps=30, render_every=1):
     ax.axis('off')
     plt.tight_layout()
 
-    pos = nx.get_node_attributes(G, 'coordinates')
+    nx_graph = G.to_networkx()
+    pos = nx.get_node_attributes(nx_graph, 'coordinates')
     for i, t in enumerate(tiles):
         center = t.center
         poly = patches.RegularPolygon(center, numVertices=6, radius=0.95,
@@ -197,12 +152,12 @@ def playback_and_export(pickle_path, output, fps=30, render_every=1):
         ax.text(center[0], center[1], label, ha='center', va='center', 
                fontsize=8, fontweight='bold')
 
-    nx.draw_networkx_edges(G, pos, ax=ax, edge_color='gray', alpha=0.2, width=1)
-    nx.draw_networkx_nodes(G, pos, ax=ax, node_size=30, node_color='lightblue', alpha=0.5)
+    nx.draw_networkx_edges(nx_graph, pos, ax=ax, edge_color='gray', alpha=0.2, width=1)
+    nx.draw_networkx_nodes(nx_graph, pos, ax=ax, node_size=30, node_color='lightblue', alpha=0.5)
 
     turn_text = ax.text(0.02, 0.98, 'Turn 0', transform=ax.transAxes, 
                        fontsize=12, color='white', bbox=dict(facecolor='black', alpha=0.8))
-    vp_text = ax.text(0.02, 0.92, 'VP: Red: 0 | Blue: 0', transform=ax.transAxes,
+    vp_text = ax.text(0.02, 0.92, 'VP: ' + ' | '.join(f"{p.name}: 0" for p in game.players), transform=ax.transAxes,
                      fontsize=10, color='white', bbox=dict(facecolor='black', alpha=0.8))
 
     metadata = dict(title='Catan Game', artist='AI Players')
@@ -223,8 +178,7 @@ def playback_and_export(pickle_path, output, fps=30, render_every=1):
             env.step(act)
             
             turn_text.set_text(f"Turn {i}")
-            vps = {p.name: p.victory_points() for p in game.players}
-            vp_text.set_text(f"VP: Red: {vps['Red']} | Blue: {vps['Blue']}")
+            vp_text.set_text('VP: ' + ' | '.join(f"{p.name}: {p.victory_points()}" for p in game.seat_players))
             
             robber_tile = next((t for t in tiles if t.has_robber), None)
             if robber_tile:
@@ -278,6 +232,11 @@ if __name__ == '__main__':
     parser.add_argument("--out-actions", default="winner_actions.pkl")
     parser.add_argument("--out-video", default="winner.gif")
     parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--players", type=int, default=2, choices=[2, 3, 4])
+    parser.add_argument("--budget-ms", type=float, help="per-move deadline for the policy")
+    parser.add_argument("--quantized", action="store_true",
+                        help="run the fallback policy as an int8 model (a float .pth or a quantize.py export); "
+                             "slower per decision than float at this network size")
     args = parser.parse_args()
 
     attempt = 0
@@ -286,7 +245,8 @@ if __name__ == '__main__':
         print(f"[Attempt {attempt}] Starting simulation...")
         
         temp_file = f"temp_{attempt}.pkl"
-        actions, vps = simulate_and_record(temp_file, model_path=args.model)
+        actions, vps = simulate_and_record(temp_file, model_path=args.model, num_players=args.players,
+                                           move_budget_ms=args.budget_ms, quantized=args.quantized)
         
         max_vp = max(vps.values())
         print(f"[Attempt {attempt}] Simulation complete: VP = {vps}")
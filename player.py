@@ -1,27 +1,118 @@
+from collections.abc import Mapping
+
+RESOURCES = ('wheat', 'sheep', 'ore', 'brick', 'wood')
+RESOURCE_INDEX = {res: i for i, res in enumerate(RESOURCES)}
+PLAYER_NAMES = ('Red', 'Blue', 'White', 'Orange')
+
+
+def make_players(num_players=2):
+    if not 2 <= num_players <= len(PLAYER_NAMES):
+        raise ValueError(f"Catan supports 2-{len(PLAYER_NAMES)} players, got {num_players}")
+    return [Player(name) for name in PLAYER_NAMES[:num_players]]
+
+
+class ResourceCounts(Mapping):
+    # resource -> count mapping over a fixed-order list, keeping the hand total current
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = [0] * len(RESOURCES)
+        self.total = 0
+
+    def __getitem__(self, res):
+        return self.counts[RESOURCE_INDEX[res]]
+
+    def __setitem__(self, res, count):
+        i = RESOURCE_INDEX[res]
+        self.total += count - self.counts[i]
+        self.counts[i] = count
+
+    def __iter__(self):
+        return iter(RESOURCES)
+
+    def __len__(self):
+        return len(RESOURCES)
+
+    def __contains__(self, res):
+        return res in RESOURCE_INDEX
+
+    def values(self):
+        return list(self.counts)
+
+    def items(self):
+        return list(zip(RESOURCES, self.counts))
+
+    def copy(self):
+        return dict(zip(RESOURCES, self.counts))
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
 class Player:
+    __slots__ = ('name', 'seat', 'resources', 'settlements', 'cities', 'roads', '_has_longest_road', '_points')
+
     def __init__(self, name):
         self.name = name
-        self.resources = {
-            'wheat' : 0, 
-            'sheep' : 0, 
-            'ore' : 0, 
-            'brick' : 0, 
-            'wood' : 0
-        }
+        self.seat = None
+        self.resources = ResourceCounts()
         self.settlements = set()
         self.cities = set()
         self.roads = set()
-        self.has_longest_road = False
+        self._has_longest_road = False
+        self._points = 0
+
+    def copy(self):
+        other = Player(self.name)
+        other.seat = self.seat
+        other.resources.counts = list(self.resources.counts)
+        other.resources.total = self.resources.total
+        other.settlements = set(self.settlements)
+        other.cities = set(self.cities)
+        other.roads = set(self.roads)
+        other._has_longest_road = self._has_longest_road
+        other._points = self._points
+        return other
+
+    def card_count(self):
+        return self.resources.total
+
+    def resource_at(self, index):
+        for res, count in zip(RESOURCES, self.resources.counts):
+            if index < count:
+                return res
+            index -= count
+        return None
 
     def add_resource(self, resource, amount):
         if resource in self.resources:
-            self.resources[resource]  += amount
-    
+            self.resources[resource] += amount
+
+    def add_settlement(self, node):
+        self.settlements.add(node)
+        self._points += 1
+
+    def add_city(self, node):
+        self.settlements.remove(node)
+        self.cities.add(node)
+        self._points += 1
+
+    def add_road(self, edge):
+        self.roads.add(edge)
+
+    @property
+    def has_longest_road(self):
+        return self._has_longest_road
+
+    @has_longest_road.setter
+    def has_longest_road(self, value):
+        value = bool(value)
+        if value != self._has_longest_road:
+            self._points += 2 if value else -2
+            self._has_longest_road = value
+
     def __str__(self):
         return f"{self.name} - Resources: {self.resources}"
-    
+
     def victory_points(self):
-        points = len(self.settlements) + 2 * len(self.cities)
-        if self.has_longest_road:
-            points += 2
-        return points
\ No newline at end of file
+        return self._points
@@ -0,0 +1,131 @@
+import os
+import pickle
+import random
+import time
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+LEGACY_KEYS = {
+    "0.weight": "fc1.weight", "0.bias": "fc1.bias",
+    "2.weight": "fc2.weight", "2.bias": "fc2.bias",
+    "4.weight": "fc3.weight", "4.bias": "fc3.bias"
+}
+LAYERS = ("fc1", "fc2", "fc3")
+
+STORAGE_DTYPES = {
+    "FloatStorage": np.float32,
+    "DoubleStorage": np.float64,
+    "HalfStorage": np.float16,
+    "LongStorage": np.int64,
+    "IntStorage": np.int32,
+    "ShortStorage": np.int16,
+    "CharStorage": np.int8,
+    "ByteStorage": np.uint8,
+    "BoolStorage": np.bool_,
+}
+
+
+def normalize_state_dict(state_dict):
+    return OrderedDict((LEGACY_KEYS.get(k, k), v) for k, v in state_dict.items())
+
+
+def _rebuild_tensor(storage, offset, size, stride, *args):
+    itemsize = storage.dtype.itemsize
+    return np.lib.stride_tricks.as_strided(
+        storage[offset:], shape=tuple(size), strides=tuple(s * itemsize for s in stride)
+    ).copy()
+
+
+class _StorageType:
+    def __init__(self, dtype):
+        self.dtype = dtype
+
+
+class _TorchUnpickler(pickle.Unpickler):
+    def __init__(self, archive, prefix, data):
+        super().__init__(data)
+        self.archive = archive
+        self.prefix = prefix
+
+    def find_class(self, module, name):
+        if module == "torch._utils" and name == "_rebuild_tensor_v2":
+            return _rebuild_tensor
+        if module == "torch" and name in STORAGE_DTYPES:
+            return _StorageType(STORAGE_DTYPES[name])
+        if module == "collections" and name == "OrderedDict":
+            return OrderedDict
+        raise pickle.UnpicklingError(f"Unsupported global in checkpoint: {module}.{name}")
+
+    def persistent_load(self, pid):
+        _, storage_type, key, _location, _numel = pid
+        raw = self.archive.read(f"{self.prefix}/data/{key}")
+        return np.frombuffer(raw, dtype=storage_type.dtype)
+
+
+def read_torch_state_dict(path):
+    with zipfile.ZipFile(path) as archive:
+        pkl = next(n for n in archive.namelist() if n.endswith("/data.pkl"))
+        prefix = pkl[:-len("/data.pkl")]
+        with archive.open(pkl) as data:
+            return _TorchUnpickler(archive, prefix, data).load()
+
+
+class NumpyPolicy:
+    def __init__(self, weights):
+        self.layers = [
+            (np.ascontiguousarray(weights[f"{name}.weight"].T, dtype=np.float32),
+             np.asarray(weights[f"{name}.bias"], dtype=np.float32))
+            for name in LAYERS
+        ]
+        self.state_dim = self.layers[0][0].shape[0]
+        self.action_dim = self.layers[-1][0].shape[1]
+
+    @classmethod
+    def from_checkpoint(cls, model_path):
+        if model_path.endswith(".npz"):
+            with np.load(model_path) as data:
+                return cls({k: data[k] for k in data.files})
+        return cls(normalize_state_dict(read_torch_state_dict(model_path)))
+
+    @classmethod
+    def load(cls, model_path, cache=True):
+        cache_path = os.path.splitext(model_path)[0] + ".npz"
+        if cache and cache_path != model_path and os.path.exists(cache_path) \
+                and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+            return cls.from_checkpoint(cache_path)
+        policy = cls.from_checkpoint(model_path)
+        if cache and cache_path != model_path:
+            policy.save(cache_path)
+        return policy
+
+    def save(self, path):
+        arrays = {}
+        for name, (w, b) in zip(LAYERS, self.layers):
+            arrays[f"{name}.weight"] = w.T
+            arrays[f"{name}.bias"] = b
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def q_values(self, obs):
+        x = np.asarray(obs, dtype=np.float32)
+        for i, (w, b) in enumerate(self.layers):
+            x = x @ w
+            x += b
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0.0, out=x)
+        return x
+
+    def select_actions(self, obs, masks):
+        q = self.q_values(np.atleast_2d(obs))
+        q[~np.atleast_2d(masks)] = -np.inf
+        return q.argmax(axis=1)
+
+    def select_action(self, state, valid_action_indices, deadline=None):
+        if deadline is not None and time.monotonic() >= deadline:
+            return int(random.choice(list(valid_action_indices)))
+        q = self.q_values(np.asarray(state, dtype=np.float32)[None, :])[0]
+        valid = np.asarray(valid_action_indices, dtype=np.intp)
+        return int(valid[q[valid].argmax()])
@@ -0,0 +1,147 @@
+import glob
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+from policy import NumpyPolicy
+
+
+class PolicyClient:
+    def __init__(self, client_id, requests, responses, action_dim):
+        self.client_id = client_id
+        self.requests = requests
+        self.responses = responses
+        self.action_dim = action_dim
+        self._next_id = 0
+
+    def select_actions(self, obs, masks, deadline=None):
+        # None if the deadline passes first; a late reply is skipped by the next request
+        self._next_id += 1
+        request_id = self._next_id
+        self.requests.put((self.client_id, request_id, np.atleast_2d(obs), np.atleast_2d(masks)))
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                rid, actions = self.responses.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if rid == request_id:
+                return actions
+
+    def select_action(self, state, valid_action_indices, deadline=None):
+        if deadline is not None and time.monotonic() >= deadline:
+            return int(random.choice(list(valid_action_indices)))
+        mask = np.zeros(self.action_dim, dtype=bool)
+        mask[valid_action_indices] = True
+        actions = self.select_actions(np.asarray(state, dtype=np.float32), mask, deadline)
+        if actions is None:
+            return int(random.choice(list(valid_action_indices)))
+        return int(actions[0])
+
+
+class PolicyServer:
+    def __init__(self, model_path, max_batch=64, max_wait_ms=2.0, watch=None, watch_interval=5.0, ctx=None):
+        self.policy = NumpyPolicy.load(model_path)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.watch_path = watch
+        self.watch_interval = watch_interval
+        self._watched = None
+
+        self.ctx = ctx or mp.get_context()
+        self.requests = self.ctx.Queue()
+        self.responses = {}
+        self.batches = 0
+        self.served = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def client(self):
+        client_id = len(self.responses)
+        self.responses[client_id] = self.ctx.Queue()
+        return PolicyClient(client_id, self.requests, self.responses[client_id], self.policy.action_dim)
+
+    def load_weights(self, path):
+        self.policy = NumpyPolicy.load(path)
+        print(f"Policy server loaded weights from {path}")
+
+    def _latest_weights(self):
+        if os.path.isdir(self.watch_path):
+            found = sorted(glob.glob(os.path.join(self.watch_path, "*.policy.npz")))
+            return found[-1] if found else None
+        return self.watch_path if os.path.exists(self.watch_path) else None
+
+    def _check_weights(self):
+        path = self._latest_weights()
+        if path is None:
+            return
+        stamp = (path, os.path.getmtime(path))
+        if stamp != self._watched:
+            self.load_weights(path)
+            self._watched = stamp
+
+    def start(self):
+        if self.watch_path:
+            self._check_weights()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _collect(self):
+        try:
+            pending = [self.requests.get(timeout=0.05)]
+        except queue.Empty:
+            return []
+        rows = len(pending[0][2])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            rows += len(item[2])
+        return pending
+
+    def _serve(self):
+        last_check = time.monotonic()
+        while not self._stop.is_set():
+            if self.watch_path and time.monotonic() - last_check >= self.watch_interval:
+                self._check_weights()
+                last_check = time.monotonic()
+
+            pending = self._collect()
+            if not pending:
+                continue
+            obs = np.concatenate([item[2] for item in pending])
+            masks = np.concatenate([item[3] for item in pending])
+            actions = self.policy.select_actions(obs, masks)
+
+            offset = 0
+            for client_id, request_id, item_obs, _ in pending:
+                n = len(item_obs)
+                self.responses[client_id].put((request_id, actions[offset:offset + n]))
+                offset += n
+            self.batches += 1
+            self.served += len(obs)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,49 @@
+import argparse
+import io
+import random
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from player import make_players
+from randomBot import RandomBot
+
+
+def sample_positions(games, per_game, players, max_moves, seed):
+    # snapshots at random moves after setup from seeded random-play games
+    bot = RandomBot()
+    positions = []
+    for g in range(games):
+        random.seed(seed + g)
+        np.random.seed(seed + g)
+        tiles, G = generate_board()
+        env = CatanEnvironment(Game(make_players(players), tiles, G))
+        rng = random.Random(seed + g)
+        picks = set(rng.sample(range(max_moves), per_game))
+        with redirect_stdout(io.StringIO()):
+            for move in range(max_moves):
+                if not env.game.setup_phase and move in picks:
+                    positions.append(env.game.to_position())
+                env.step(bot.select_action(None, env.valid_action_indices().tolist()))
+                if env.game.game_over:
+                    break
+    return positions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--per-game", type=int, default=5, help="positions sampled from each game")
+    parser.add_argument("--players", type=int, default=2, choices=[2, 3, 4])
+    parser.add_argument("--max-moves", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    positions = sample_positions(args.games, args.per_game, args.players, args.max_moves, args.seed)
+    with open(args.output, 'w') as f:
+        f.write("\n".join(positions) + "\n")
+    print(f"Wrote {len(positions)} positions to {args.output}")
@@ -0,0 +1,161 @@
+import argparse
+import io
+import os
+import random
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+import torch
+
+from catanboard import generate_board
+from dataset import TrajectoryDataset
+from dqn_agent import QNetwork, quantize_qnetwork
+from environment import CatanEnvironment
+from game import Game
+from player import make_players
+from policy import NumpyPolicy, normalize_state_dict
+
+
+class QuantizedPolicy:
+    # NumpyPolicy's interface over a dynamically quantized QNetwork
+    def __init__(self, model, state_dim, action_dim):
+        self.model = model
+        self.state_dim = state_dim
+        self.action_dim = action_dim
+
+    @classmethod
+    def from_state_dict(cls, weights):
+        weights = normalize_state_dict(weights)
+        state_dim, action_dim = weights['fc1.weight'].shape[1], weights['fc3.weight'].shape[0]
+        model = QNetwork(state_dim, action_dim)
+        model.load_state_dict(weights)
+        return cls(quantize_qnetwork(model), state_dim, action_dim)
+
+    @classmethod
+    def load(cls, model_path):
+        data = torch.load(model_path, weights_only=False)
+        if 'quantized' not in data:
+            return cls.from_state_dict(data)
+        model = quantize_qnetwork(QNetwork(data['state_dim'], data['action_dim']))
+        model.load_state_dict(data['quantized'])
+        return cls(model, data['state_dim'], data['action_dim'])
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        torch.save({'state_dim': self.state_dim, 'action_dim': self.action_dim,
+                    'quantized': self.model.state_dict()}, tmp_path)
+        os.replace(tmp_path, path)
+
+    def q_values(self, obs):
+        with torch.no_grad():
+            return self.model(torch.from_numpy(np.asarray(obs, dtype=np.float32))).numpy()
+
+    def select_actions(self, obs, masks):
+        q = self.q_values(np.atleast_2d(obs))
+        q[~np.atleast_2d(masks)] = -np.inf
+        return q.argmax(axis=1)
+
+    def select_action(self, state, valid_action_indices, deadline=None):
+        if deadline is not None and time.monotonic() >= deadline:
+            return int(random.choice(list(valid_action_indices)))
+        q = self.q_values(np.asarray(state, dtype=np.float32)[None, :])[0]
+        valid = np.asarray(valid_action_indices, dtype=np.intp)
+        return int(valid[q[valid].argmax()])
+
+
+def recorded_states(directory, limit):
+    obs, masks, n = [], [], 0
+    for batch in TrajectoryDataset(directory, batch_size=1024, shuffle=False):
+        obs.append(batch['obs'])
+        masks.append(batch['masks'])
+        n += len(batch['obs'])
+        if n >= limit:
+            break
+    return np.concatenate(obs)[:limit], np.concatenate(masks)[:limit]
+
+
+def sampled_states(state_dim, limit, seed):
+    # random-play positions; the legacy 10-dim checkpoint sees state_to_array over the six verbs
+    random.seed(seed)
+    np.random.seed(seed)
+    obs, masks = [], []
+    with redirect_stdout(io.StringIO()):
+        while len(obs) < limit:
+            tiles, G = generate_board()
+            env = CatanEnvironment(Game(make_players(2), tiles, G))
+            legacy = state_dim != env.game.features.size
+            for _ in range(500):
+                if legacy:
+                    obs.append(env.state_to_array(env.get_state()))
+                    masks.append(np.isin(env.actions, env.get_valid_actions()))
+                else:
+                    obs.append(env.observe().copy())
+                    masks.append(env.action_mask().copy())
+                legal = env.valid_action_indices()
+                env.step(int(legal[random.randrange(len(legal))]))
+                if env.game.game_over or len(obs) >= limit:
+                    break
+    obs, masks = np.stack(obs), np.stack(masks)
+    keep = masks.any(axis=1)
+    return obs[keep], masks[keep]
+
+
+def per_decision_ms(policy, obs, masks, repeats=200):
+    start = time.perf_counter()
+    for i in range(repeats):
+        policy.select_action(obs[i % len(obs)], np.flatnonzero(masks[i % len(obs)]))
+    return (time.perf_counter() - start) * 1000.0 / repeats
+
+
+def check(float_policy, quantized, obs, masks):
+    agree = float_policy.select_actions(obs, masks) == quantized.select_actions(obs, masks)
+    error = np.abs(float_policy.q_values(obs) - quantized.q_values(obs))
+    return {
+        'states': len(obs),
+        'agreement': float(agree.mean()),
+        'max_q_error': float(error.max()),
+        'mean_q_error': float(error.mean()),
+        'float_ms': per_decision_ms(float_policy, obs, masks),
+        'int8_ms': per_decision_ms(quantized, obs, masks),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", nargs="?", default="dqnCatan.pth")
+    parser.add_argument("--out", help="int8 model path (default: <model>.int8.pt)")
+    parser.add_argument("--dataset", help="check agreement on states from a recorded trajectory dataset")
+    parser.add_argument("--states", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-agreement", type=float, default=0.0,
+                        help="exit non-zero if the int8 model agrees with the float one on fewer actions")
+    parser.add_argument("--require-speedup", action="store_true",
+                        help="exit non-zero unless the int8 model is faster per decision than the float one")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    weights = normalize_state_dict(torch.load(args.model))
+    float_policy = NumpyPolicy({k: v.numpy() for k, v in weights.items()})
+    quantized = QuantizedPolicy.from_state_dict(weights)
+
+    if args.dataset:
+        obs, masks = recorded_states(args.dataset, args.states)
+    else:
+        obs, masks = sampled_states(float_policy.state_dim, args.states, args.seed)
+    report = check(float_policy, quantized, obs, masks)
+    print(f"{report['states']} states: {report['agreement']:.2%} action agreement, "
+          f"max |dQ| {report['max_q_error']:.4f}, mean |dQ| {report['mean_q_error']:.4f}")
+    print(f"per decision: float {report['float_ms']:.3f}ms, int8 {report['int8_ms']:.3f}ms")
+
+    out = args.out or os.path.splitext(args.model)[0] + ".int8.pt"
+    quantized.save(out)
+    print(f"Wrote {out} ({os.path.getsize(out) / 1024:.1f} KiB, float {os.path.getsize(args.model) / 1024:.1f} KiB)")
+    if report['int8_ms'] >= report['float_ms']:
+        message = (f"int8 is not faster per decision ({report['int8_ms']:.3f}ms vs float "
+                   f"{report['float_ms']:.3f}ms); dynamic quantization only pays off on wide layers or large batches")
+        if args.require_speedup:
+            raise SystemExit(message)
+        print(f"Warning: {message}")
+    if report['agreement'] < args.min_agreement:
+        raise SystemExit(f"Action agreement {report['agreement']:.2%} is below {args.min_agreement:.2%}")
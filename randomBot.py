@@ -1,5 +1,5 @@
 import random
 
 class RandomBot:
-    def select_action(self, state, valid_actions):
+    def select_action(self, state, valid_actions, deadline=None):
         return random.choice(valid_actions)
\ No newline at end of file
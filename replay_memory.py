@@ -0,0 +1,110 @@
+from collections import OrderedDict
+
+import numpy as np
+
+TRANSITION_COLUMNS = ('state_idx', 'next_idx', 'actions', 'rewards', 'dones', 'discounts', 'next_masks')
+RECENT_POSITIONS = 16
+
+
+class CompactReplayMemory:
+    def __init__(self, codec, maxlen, action_dim):
+        self.codec = codec
+        self.maxlen = maxlen
+        self.action_dim = action_dim
+        # each transition writes at most two positions and only reuses one of the last
+        # RECENT_POSITIONS, so this many slots never overwrite a position a live transition uses
+        self.positions = np.zeros(2 * maxlen + RECENT_POSITIONS, dtype=codec.dtype)
+        self.state_idx = np.zeros(maxlen, dtype=np.int64)
+        self.next_idx = np.zeros(maxlen, dtype=np.int64)
+        self.actions = np.zeros(maxlen, dtype=np.int64)
+        self.rewards = np.zeros(maxlen, dtype=np.float32)
+        self.dones = np.zeros(maxlen, dtype=bool)
+        self.discounts = np.zeros(maxlen, dtype=np.float32)
+        self.next_masks = np.zeros((maxlen, (action_dim + 7) // 8), dtype=np.uint8)
+        self.count = 0
+        self.head = 0
+        self.pos_head = 0
+        self._recent = OrderedDict()
+        self._scratch = np.zeros(1, dtype=codec.dtype)
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return self.positions.nbytes + sum(getattr(self, c).nbytes for c in TRANSITION_COLUMNS)
+
+    def _position(self, obs):
+        # consecutive and n-step transitions share a position when its encoding matches one of
+        # the last RECENT_POSITIONS stored, so a reused observe() buffer is compared by content
+        self.codec.encode(obs, self._scratch, 0)
+        key = self._scratch.tobytes()
+        i = self._recent.get(key)
+        if i is not None:
+            return i
+        i = self.pos_head
+        self.positions[i] = self._scratch[0]
+        self.pos_head = (i + 1) % len(self.positions)
+        self._recent[key] = i
+        if len(self._recent) > RECENT_POSITIONS:
+            self._recent.popitem(last=False)
+        return i
+
+    def add(self, state, action, reward, next_state, done, discount, next_mask):
+        s = self._position(state)
+        n = self._position(next_state)
+
+        slot = self.head
+        self.state_idx[slot] = s
+        self.next_idx[slot] = n
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.dones[slot] = done
+        self.discounts[slot] = discount
+        self.next_masks[slot] = np.packbits(np.asarray(next_mask, dtype=bool))
+        self.head = (slot + 1) % self.maxlen
+        self.count = min(self.count + 1, self.maxlen)
+
+    def _slots(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        if self.count < self.maxlen:
+            return indices
+        return (self.head + indices) % self.maxlen
+
+    def batch(self, indices):
+        slots = self._slots(indices)
+        return (
+            self.codec.decode(self.positions[self.state_idx[slots]]),
+            self.actions[slots],
+            self.rewards[slots],
+            self.codec.decode(self.positions[self.next_idx[slots]]),
+            self.dones[slots],
+            self.discounts[slots],
+            np.unpackbits(self.next_masks[slots], axis=1, count=self.action_dim).astype(bool),
+        )
+
+    def state_dict(self):
+        state = {c: getattr(self, c).copy() for c in TRANSITION_COLUMNS}
+        state['positions'] = self.positions.copy()
+        state['boards'] = np.stack(self.codec.boards) if self.codec.boards else np.zeros((0, 0), np.float32)
+        state['cursor'] = np.array([self.count, self.head, self.pos_head], dtype=np.int64)
+        return state
+
+    def load_state_dict(self, state):
+        self.codec.load_boards(state['boards'])
+        count, head, pos_head = (int(v) for v in state['cursor'])
+        if len(state['actions']) == self.maxlen:
+            for c in TRANSITION_COLUMNS:
+                getattr(self, c)[:] = state[c]
+            self.positions[:len(state['positions'])] = state['positions']
+            self.count, self.head, self.pos_head = count, head, pos_head
+        else:
+            old = CompactReplayMemory(self.codec, len(state['actions']), self.action_dim)
+            for c in TRANSITION_COLUMNS:
+                getattr(old, c)[:] = state[c]
+            old.positions[:len(state['positions'])] = state['positions']
+            old.count, old.head, old.pos_head = count, head, pos_head
+            self.count = self.head = self.pos_head = 0
+            for start in range(0, count, 4096):
+                for row in zip(*old.batch(np.arange(start, min(count, start + 4096)))):
+                    self.add(*row)
+        self._recent.clear()
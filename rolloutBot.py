@@ -0,0 +1,72 @@
+import io
+import random
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+
+class RolloutBot:
+    def __init__(self, env, depth=20, rollouts=8, seed=None):
+        self.env = env
+        self.depth = depth
+        self.rollouts = rollouts
+        self.rng = random.Random(seed)
+        self._scratch = None
+        self._cost = 0.0
+
+    def _score(self, game, seat):
+        me = game.seat_players[seat]
+        best_other = max((p.victory_points() for p in game.players if p.seat != seat), default=0)
+        return me.victory_points() - best_other + 0.05 * me.card_count()
+
+    def _rollout(self, game, action, seat):
+        env = self._scratch
+        env.game = game.clone()
+        random.seed(self.rng.getrandbits(32))
+        env.step(action)
+        for _ in range(self.depth):
+            if env.game.game_over:
+                break
+            legal = env.valid_action_indices()
+            env.step(int(legal[self.rng.randrange(len(legal))]))
+        return self._score(env.game, seat)
+
+    def select_action(self, state, valid_actions, deadline=None):
+        valid = [int(a) for a in valid_actions]
+        if len(valid) == 1:
+            return valid[0]
+
+        game = self.env.game
+        seat = game.current_player.seat
+        if self._scratch is None:
+            self._scratch = self.env.fork(game.clone())
+
+        totals = np.zeros(len(valid))
+        counts = np.zeros(len(valid))
+        budget = self.rollouts * len(valid)
+        # slowest recent rollout, decayed per move so one outlier doesn't starve later moves
+        self._cost *= 0.95
+        saved = random.getstate()
+        try:
+            with redirect_stdout(io.StringIO()):
+                i = 0
+                while True:
+                    if deadline is None:
+                        if i >= budget:
+                            break
+                    elif time.monotonic() + 2 * self._cost >= deadline:
+                        break
+                    start = time.monotonic()
+                    k = i % len(valid)
+                    totals[k] += self._rollout(game, valid[k], seat)
+                    counts[k] += 1
+                    i += 1
+                    self._cost = max(self._cost, time.monotonic() - start)
+        finally:
+            random.setstate(saved)
+
+        if not counts.any():
+            return valid[0]
+        means = np.where(counts > 0, totals / np.maximum(counts, 1), -np.inf)
+        return valid[int(means.argmax())]
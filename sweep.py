@@ -0,0 +1,221 @@
+import argparse
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from latency import LatencyRecorder
+from player import make_players
+from tournament import TableSeat, make_seat
+
+SPACE = {
+    'lr': [1e-3, 3e-4, 1e-4, 3e-5],
+    'gamma': [0.95, 0.98, 0.99, 0.995],
+    'epsilon_decay': [0.99, 0.995, 0.999, 0.9995],
+    'batch_size': [32, 64, 128],
+    'memory_size': [5000, 10000, 50000],
+    'target_update_every': [50, 100, 500],
+    'n_step': [1, 3, 5],
+    'double_dqn': [False, True],
+}
+OPPONENTS = ("random", "rollout", "heuristic")
+STATE_FILE = "sweep.json"
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def sample_configs(n, seed):
+    rng = random.Random(seed)
+    return [{name: rng.choice(values) for name, values in SPACE.items()} for _ in range(n)]
+
+
+def rung_budgets(min_episodes, max_episodes, eta):
+    budgets = [min_episodes]
+    while budgets[-1] * eta <= max_episodes:
+        budgets.append(budgets[-1] * eta)
+    return budgets
+
+
+def evaluate(policy, opponents, games, seed, max_moves):
+    # the same seeded boards and opponent lineups for every trial; the trial's seat rotates
+    lineup = ["trial"] + list(opponents)
+    wins = points = 0
+    recorder = LatencyRecorder()
+    for g in range(games):
+        random.seed(seed + g)
+        np.random.seed(seed + g)
+        tiles, G = generate_board()
+        env = CatanEnvironment(Game(make_players(len(lineup)), tiles, G))
+        shift = g % len(lineup)
+        names = lineup[shift:] + lineup[:shift]
+        seats = [TableSeat(policy) if name == "trial" else make_seat(name, env, None, seed + g + i)
+                 for i, name in enumerate(names)]
+        for _ in range(max_moves):
+            seat = env.game.current_player.seat
+            env.step(seats[seat].choose(env, None, recorder))
+            if env.game.game_over:
+                break
+        vp = env.game.seat_players[names.index("trial")].victory_points()
+        points += vp
+        wins += vp >= 10
+    return {'wins': wins, 'avg_vp': points / games, 'score': wins / games + points / (10.0 * games)}
+
+
+def run_trial(directory, trial, episodes, args):
+    # heavy imports stay in the worker so the driver process starts fast
+    import torch
+
+    from checkpoint import CheckpointManager
+    from dqn_agent import DQNAgent
+    from policy import NumpyPolicy
+
+    trial_dir = os.path.join(directory, f"trial_{trial['id']:03d}")
+    curve_path = os.path.join(trial_dir, "curve.json")
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        tiles, G = generate_board()
+        env = CatanEnvironment(Game(make_players(args['players']), tiles, G))
+        agent = DQNAgent(state_dim=env.observation_space.shape[0], action_dim=len(env.action_table),
+                         **trial['config'])
+        checkpoints = CheckpointManager(trial_dir, keep_last=1, save_replay=True)
+        resumed = checkpoints.load(agent)
+        if resumed:
+            start_episode = resumed['episode']
+            rewards = list(resumed['extra'].get('rewards_per_episode', []))
+        else:
+            random.seed(trial['seed'])
+            np.random.seed(trial['seed'])
+            torch.manual_seed(trial['seed'])
+            start_episode, rewards = 0, []
+        curve = {'config': trial['config'], 'episode_rewards': rewards, 'evals': []}
+        if os.path.exists(curve_path):
+            with open(curve_path) as f:
+                curve['evals'] = json.load(f)['evals']
+
+        for episode in range(start_episode, episodes):
+            env.reset()
+            state_tensor = torch.from_numpy(env.observe().copy())
+            done = False
+            total_reward = 0
+            for _ in range(args['max_turns']):
+                action_idx = agent.select_action(state_tensor, env.valid_action_indices().tolist())
+                _, reward, done, _ = env.step(action_idx)
+                next_state_tensor = torch.from_numpy(env.observe().copy())
+                agent.remember(state_tensor, action_idx, reward, next_state_tensor, done, env.action_mask())
+                agent.replay()
+                state_tensor = next_state_tensor
+                total_reward += reward
+                if done:
+                    break
+            agent.end_episode()
+            rewards.append(total_reward)
+
+        checkpoints.save(agent, episodes, {'rewards_per_episode': rewards})
+        checkpoints.close()
+
+        policy = NumpyPolicy({k: v.numpy() for k, v in agent.model.state_dict().items()})
+        result = evaluate(policy, args['opponents'], args['eval_games'], args['eval_seed'], args['max_turns'])
+
+    result['episodes'] = episodes
+    curve['evals'] = [e for e in curve['evals'] if e['episodes'] != episodes] + [result]
+    _write_json(curve_path, curve)
+    return trial['id'], result
+
+
+def load_state(directory, args):
+    path = os.path.join(directory, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        print(f"Resuming sweep in {directory} at rung {state['rung']}")
+        return state
+    configs = sample_configs(args.trials, args.seed)
+    state = {
+        'settings': {
+            'players': len(args.opponents) + 1,
+            'max_turns': args.max_turns,
+            'opponents': args.opponents,
+            'eval_games': args.eval_games,
+            'eval_seed': args.eval_seed,
+            'budgets': rung_budgets(args.min_episodes, args.max_episodes, args.eta),
+            'eta': args.eta,
+        },
+        'rung': 0,
+        'trials': [{'id': i, 'config': config, 'seed': args.seed + i, 'alive': True, 'results': []}
+                   for i, config in enumerate(configs)],
+    }
+    os.makedirs(directory, exist_ok=True)
+    _write_json(path, state)
+    return state
+
+
+def sweep(directory, state, workers):
+    path = os.path.join(directory, STATE_FILE)
+    settings = state['settings']
+    budgets = settings['budgets']
+    while state['rung'] < len(budgets):
+        rung, episodes = state['rung'], budgets[state['rung']]
+        alive = [t for t in state['trials'] if t['alive']]
+        pending = [t for t in alive if len(t['results']) <= rung]
+        print(f"Rung {rung}: {len(alive)} trials at {episodes} episodes ({len(pending)} to run)")
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_trial, directory, t, episodes, settings) for t in pending]
+            for future in as_completed(futures):
+                trial_id, result = future.result()
+                trial = state['trials'][trial_id]
+                trial['results'].append(result)
+                _write_json(path, state)
+                print(f"  trial {trial_id}: score {result['score']:.3f} "
+                      f"({result['wins']} wins, {result['avg_vp']:.2f} avg VP) {trial['config']}")
+
+        if rung + 1 < len(budgets):
+            keep = max(1, math.ceil(len(alive) / settings['eta']))
+            ranked = sorted(alive, key=lambda t: t['results'][rung]['score'], reverse=True)
+            for trial in ranked[keep:]:
+                trial['alive'] = False
+        state['rung'] = rung + 1
+        _write_json(path, state)
+    return state
+
+
+def leaderboard(state):
+    def best(trial):
+        return (len(trial['results']), trial['results'][-1]['score'] if trial['results'] else 0.0)
+    return sorted(state['trials'], key=best, reverse=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default="sweeps/default", help="results store; an existing sweep here is resumed")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--min-episodes", type=int, default=50, help="episodes per trial at the first rung")
+    parser.add_argument("--max-episodes", type=int, default=5000)
+    parser.add_argument("--eta", type=int, default=3, help="keep the top 1/eta trials at each rung")
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--opponents", nargs="+", default=["random"], choices=OPPONENTS,
+                        help="1-3 fixed evaluation opponents; trials train and play with one extra seat")
+    parser.add_argument("--eval-games", type=int, default=10)
+    parser.add_argument("--eval-seed", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not 1 <= len(args.opponents) <= 3:
+        parser.error("--opponents takes 1-3 agents")
+
+    state = sweep(args.dir, load_state(args.dir, args), args.workers)
+    print("\nBest trials:")
+    for trial in leaderboard(state)[:5]:
+        last = trial['results'][-1]
+        print(f"  trial {trial['id']}: {last['score']:.3f} after {last['episodes']} episodes {trial['config']}")
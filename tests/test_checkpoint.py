@@ -0,0 +1,8 @@
+import pytest
+
+from checkpoint import CheckpointManager
+
+
+def test_keep_last_must_retain_a_checkpoint(tmp_path):
+    with pytest.raises(ValueError):
+        CheckpointManager(str(tmp_path), keep_last=0)
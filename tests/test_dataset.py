@@ -0,0 +1,36 @@
+import os
+import pickle
+
+import pytest
+
+from dataset import import_replay
+
+REPLAY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "winner_actions.pkl")
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, obs, action, reward, mask, done):
+        self.rows.append((obs, action, reward, mask, done))
+
+
+def test_import_replay_writes_the_shipped_game():
+    writer = ListWriter()
+    assert import_replay(REPLAY, writer) == len(writer.rows) > 0
+    assert writer.rows[-1][4]
+
+
+def test_import_replay_rejects_a_diverged_recording(tmp_path):
+    with open(REPLAY, 'rb') as f:
+        record = pickle.load(f)
+    record['states'][3]['buildings']['Red']['settlements'] = [0]
+    path = tmp_path / "diverged.pkl"
+    with open(path, 'wb') as f:
+        pickle.dump(record, f)
+
+    writer = ListWriter()
+    with pytest.raises(ValueError, match="turn 4"):
+        import_replay(str(path), writer)
+    assert not writer.rows
@@ -0,0 +1,9 @@
+import pytest
+
+from perft import GOLDEN, run
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_builder_position_matches_golden(depth):
+    leaves, _, _ = run('builder', depth)
+    assert leaves == GOLDEN[('builder', depth)]
@@ -0,0 +1,42 @@
+import queue
+import threading
+
+import numpy as np
+
+from latency import LatencyRecorder, timed_select
+from policy_server import PolicyClient
+
+ACTION_DIM = 8
+
+
+def answer(requests, responses, action):
+    client_id, request_id, obs, masks = requests.get(timeout=5)
+    responses.put((request_id, np.full(len(obs), action)))
+
+
+def test_select_action_through_timed_select():
+    requests, responses = queue.Queue(), queue.Queue()
+    client = PolicyClient(0, requests, responses, ACTION_DIM)
+    server = threading.Thread(target=answer, args=(requests, responses, 5))
+    server.start()
+    recorder = LatencyRecorder()
+    choice = timed_select(recorder, 5.0, client.select_action, np.zeros(4), [2, 5])
+    server.join()
+    assert choice == 5
+    assert recorder.summary()['moves'] == 1
+
+
+def test_select_action_falls_back_when_the_server_is_late():
+    requests, responses = queue.Queue(), queue.Queue()
+    client = PolicyClient(0, requests, responses, ACTION_DIM)
+    recorder = LatencyRecorder()
+    choice = timed_select(recorder, 0.01, client.select_action, np.zeros(4), [2, 5])
+    assert choice in (2, 5)
+
+    # the late reply to the abandoned request is skipped by the next one
+    responses.put((1, np.array([2])))
+    server = threading.Thread(target=answer, args=(requests, responses, 5))
+    requests.get_nowait()
+    server.start()
+    assert timed_select(recorder, None, client.select_action, np.zeros(4), [2, 5]) == 5
+    server.join()
@@ -0,0 +1,36 @@
+import io
+import random
+from contextlib import redirect_stdout
+
+import numpy as np
+import pytest
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from player import make_players
+
+
+@pytest.mark.parametrize("players", [2, 3, 4])
+def test_position_round_trip_reproduces_observation(players):
+    checked = 0
+    with redirect_stdout(io.StringIO()):
+        for seed in range(6):
+            random.seed(seed)
+            np.random.seed(seed)
+            rng = random.Random(seed)
+            tiles, G = generate_board()
+            env = CatanEnvironment(Game(make_players(players), tiles, G))
+            for move in range(300):
+                game = env.game
+                if not game.setup_phase and not game.robber_pending and move % 10 == 0:
+                    text = game.to_position()
+                    restored = Game.from_position(text)
+                    assert restored.to_position() == text
+                    assert np.array_equal(restored.features.observe(restored), game.features.observe(game))
+                    checked += 1
+                legal = env.valid_action_indices()
+                env.step(int(legal[rng.randrange(len(legal))]))
+                if env.game.game_over:
+                    break
+    assert checked
@@ -0,0 +1,37 @@
+import random
+
+import numpy as np
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from observation import PositionCodec
+from player import make_players
+from replay_memory import CompactReplayMemory
+
+
+def test_shared_observe_buffer_is_stored_by_content():
+    random.seed(0)
+    np.random.seed(0)
+    tiles, G = generate_board()
+    env = CatanEnvironment(Game(make_players(2), tiles, G))
+    while not env.game.turn_order_determined:
+        env.step(env.action_table.roll)
+    codec = PositionCodec(env.game.features)
+    memory = CompactReplayMemory(codec, 8, len(env.action_table))
+
+    state = env.observe().copy()
+    for expected_positions in (2, 3):
+        action = int(env.valid_action_indices()[0])
+        env.step(action)
+        memory.add(state, action, 0.0, env.observe(), False, 1.0, env.action_mask())
+        state = env.observe().copy()
+        assert memory.pos_head == expected_positions
+
+    # the second transition starts where the first ended and ends on a new position,
+    # although both next states came from the same observe() buffer
+    assert memory.state_idx[1] == memory.next_idx[0]
+    assert memory.next_idx[1] != memory.next_idx[0]
+    states, _, _, next_states, _, _, _ = memory.batch([0, 1])
+    assert np.array_equal(next_states[0], states[1])
+    assert not np.array_equal(states[1], next_states[1])
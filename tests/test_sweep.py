@@ -0,0 +1,25 @@
+import sweep
+from environment import CatanEnvironment
+from randomBot import RandomBot
+
+
+def test_evaluate_scores_the_trial_seat(monkeypatch):
+    envs = []
+
+    class RecordingEnvironment(CatanEnvironment):
+        def __init__(self, game):
+            super().__init__(game)
+            envs.append(self)
+
+    monkeypatch.setattr(sweep, "CatanEnvironment", RecordingEnvironment)
+    lineup = ["trial", "random", "random"]
+    games = 6
+    result = sweep.evaluate(RandomBot(), lineup[1:], games, seed=7, max_moves=400)
+
+    assert len(envs) == games
+    points = 0
+    for g, env in enumerate(envs):
+        shift = g % len(lineup)
+        names = lineup[shift:] + lineup[:shift]
+        points += env.game.seat_players[names.index("trial")].victory_points()
+    assert result['avg_vp'] == points / games
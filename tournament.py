@@ -0,0 +1,109 @@
+import argparse
+import io
+import random
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from heuristicBot import HeuristicBot
+from latency import LatencyRecorder, timed_select
+from player import make_players
+from policy import NumpyPolicy
+from randomBot import RandomBot
+from rolloutBot import RolloutBot
+
+AGENTS = ("random", "dqn", "rollout", "heuristic")
+
+
+class TableSeat:
+    # picks from the full action table using the rich observation
+    def __init__(self, agent):
+        self.agent = agent
+
+    def choose(self, env, budget, recorder):
+        return int(timed_select(recorder, budget, self.agent.select_action,
+                                env.observe(), env.valid_action_indices()))
+
+
+class VerbSeat:
+    # the shipped checkpoint scores the six coarse verbs from the legacy 10-dim state
+    def __init__(self, agent):
+        self.agent = agent
+
+    def choose(self, env, budget, recorder):
+        valid = [env.actions.index(a) for a in sorted(env.get_valid_actions())]
+        state = env.state_to_array(env.get_state())
+        return env.actions[timed_select(recorder, budget, self.agent.select_action, state, valid)]
+
+
+def make_seat(name, env, model, seed):
+    if name == "random":
+        return TableSeat(RandomBot())
+    if name == "dqn":
+        return VerbSeat(model)
+    if name == "rollout":
+        return TableSeat(RolloutBot(env, seed=seed))
+    if name == "heuristic":
+        return TableSeat(HeuristicBot(env))
+    raise ValueError(f"unknown agent {name!r}")
+
+
+def play_game(agent_names, seed, budget, max_moves, model, recorders):
+    random.seed(seed)
+    np.random.seed(seed)
+    tiles, G = generate_board()
+    env = CatanEnvironment(Game(make_players(len(agent_names)), tiles, G))
+    seats = [make_seat(name, env, model, seed + i) for i, name in enumerate(agent_names)]
+
+    with redirect_stdout(io.StringIO()):
+        for _ in range(max_moves):
+            seat = env.game.current_player.seat
+            action = seats[seat].choose(env, budget, recorders[agent_names[seat]])
+            env.step(action)
+            if env.game.game_over:
+                break
+    return {p.seat: p.victory_points() for p in env.game.players}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", nargs="+", default=["rollout", "dqn"], choices=AGENTS,
+                        help="one agent per seat (2-4); seats rotate between games")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="per-move deadline; 0 disables it")
+    parser.add_argument("--max-moves", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="dqnCatan.pth")
+    parser.add_argument("--histogram", action="store_true")
+    args = parser.parse_args()
+
+    model = NumpyPolicy.load(args.model) if "dqn" in args.agents else None
+    budget = args.budget_ms / 1000.0 if args.budget_ms > 0 else None
+    recorders = {name: LatencyRecorder(name) for name in args.agents}
+    wins = {name: 0 for name in args.agents}
+    points = {name: 0 for name in args.agents}
+    played = {name: 0 for name in args.agents}
+
+    start = time.perf_counter()
+    for g in range(args.games):
+        shift = g % len(args.agents)
+        lineup = args.agents[shift:] + args.agents[:shift]
+        vps = play_game(lineup, args.seed + g, budget, args.max_moves, model, recorders)
+        for seat, name in enumerate(lineup):
+            points[name] += vps[seat]
+            played[name] += 1
+            if vps[seat] >= 10:
+                wins[name] += 1
+        print(f"game {g + 1}: " + ", ".join(f"{name}={vps[seat]}" for seat, name in enumerate(lineup)))
+
+    print(f"\n{args.games} games in {time.perf_counter() - start:.1f}s, budget "
+          f"{args.budget_ms:g}ms per move")
+    for name in dict.fromkeys(args.agents):
+        print(f"{name}: {wins[name]} wins, {points[name] / max(played[name], 1):.2f} avg VP")
+        print(recorders[name].format_summary())
+        if args.histogram:
+            print(recorders[name].format_histogram())
@@ -1,71 +1,152 @@
+import argparse
+import os
+
+import numpy as np
+import torch
+
 from environment import CatanEnvironment
 from dqn_agent import DQNAgent
-from player import Player
-from game import Game
+from policy import normalize_state_dict
+from checkpoint import CheckpointManager
+from dataset import TrajectoryWriter
+from player import make_players
+from game import Game, load_positions
+from observation import PositionCodec
 from catanboard import generate_board
-import torch
-import matplotlib.pyplot as plt
-import numpy as np
-import os
-
-tiles, G = generate_board()
-game = Game([Player("Red"), Player("Blue")], tiles, G)
-env = CatanEnvironment(game)
-agent = DQNAgent(state_dim=10, action_dim=6)
-rewards_per_episode = []
 
 MODEL_PATH = "dqnCatan.pth"
-if os.path.exists(MODEL_PATH):
-    agent.model.load_state_dict(torch.load(MODEL_PATH))
-    print(f"Loaded weights from {MODEL_PATH}")
-    
-num_episodes = 5000
-MAX_TURNS = 500
-
-for episode in range(num_episodes):
-    state = env.reset()
-    state_tensor = env.state_to_tensor(state)
-    done = False
-    total_reward = 0
-    turn_count = 0
-
-    while not done and turn_count < MAX_TURNS:
-        valid = env.get_valid_actions()
-        valid_action_indices = [env.actions.index(a) for a in valid]
-        action_idx = agent.select_action(state_tensor, valid_action_indices)
-        action = env.actions[action_idx]
-
-        print(f"Valid actions for {state['current_player']}: {valid}")
-        print(f"[{state['current_player']}] Action chosen: {action} | Resources: {state['resources']} | VP: {state['victory_points']}")
-
-        next_state, reward, done, _ = env.step(action)
-        next_state_tensor = env.state_to_tensor(next_state)
-
-        agent.remember(state_tensor, action_idx, reward, next_state_tensor, done)
-        agent.replay()
-
-        state = next_state
-        state_tensor = next_state_tensor
-        total_reward += reward
-        turn_count += 1
-
-    print(f"Episode {episode + 1} finished. Total Reward: {total_reward}, Winner: {state['current_player'] if reward > 0 else 'None'}\n")
-    rewards_per_episode.append(total_reward)
-    if episode % 10 == 0:
-        avg = sum(rewards_per_episode[-10:]) / 10
-        print(f"Average reward last 10 episodes: {avg:.2f}")
-
-torch.save(agent.model.state_dict(), MODEL_PATH)
+
 
 def moving_average(values, window=10):
     return [np.mean(values[max(0, i-window):(i+1)]) for i in range(len(values))]
 
-plt.plot(rewards_per_episode, label='Raw Rewards')
-plt.plot(moving_average(rewards_per_episode), label='Smoothed (window=10)', linewidth=2)
-plt.xlabel("Episode")
-plt.ylabel("Total Reward")
-plt.title("DQN Agent Performance Over Time")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+
+def plot_rewards(rewards_per_episode):
+    import matplotlib.pyplot as plt
+
+    plt.plot(rewards_per_episode, label='Raw Rewards')
+    plt.plot(moving_average(rewards_per_episode), label='Smoothed (window=10)', linewidth=2)
+    plt.xlabel("Episode")
+    plt.ylabel("Total Reward")
+    plt.title("DQN Agent Performance Over Time")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
+
+
+def train(args):
+    tiles, G = generate_board()
+    game = Game(make_players(args.players), tiles, G)
+    env = CatanEnvironment(game, load_positions(args.positions) if args.positions else None)
+    state_dim = env.observation_space.shape[0]
+    codec = PositionCodec(game.features) if args.compact_replay else None
+    agent = DQNAgent(state_dim=state_dim, action_dim=len(env.action_table),
+                     updates_per_batch=args.updates_per_batch, memory_size=args.memory_size, codec=codec,
+                     quantize_actor=args.quantize_actor, n_step=args.n_step, double_dqn=args.double_dqn)
+    rewards_per_episode = []
+    start_episode = 0
+
+    checkpoints = None
+    if args.checkpoint_dir:
+        checkpoints = CheckpointManager(args.checkpoint_dir, keep_last=args.keep, save_replay=args.save_replay)
+
+    resumed = checkpoints.load(agent) if args.resume and checkpoints else None
+    if resumed:
+        start_episode = resumed['episode']
+        rewards_per_episode = list(resumed['extra'].get('rewards_per_episode', []))
+    elif os.path.exists(args.model):
+        weights = normalize_state_dict(torch.load(args.model))
+        if 'fc1.weight' in weights and weights['fc1.weight'].shape[1] == state_dim:
+            agent.load_weights(weights)
+            print(f"Loaded weights from {args.model}")
+        else:
+            print(f"Skipping {args.model}: weights do not match observation size {state_dim}")
+
+    writer = TrajectoryWriter(args.record_dir, state_dim, len(env.action_table)) if args.record_dir else None
+
+    if args.async_learner:
+        agent.start_learner(replay_ratio=args.replay_ratio)
+
+    for episode in range(start_episode, args.episodes):
+        state = env.reset()
+        state_tensor = torch.from_numpy(env.observe().copy())
+        done = False
+        total_reward = 0
+        turn_count = 0
+
+        while not done and turn_count < args.max_turns:
+            mask = env.action_mask()
+            valid_action_indices = np.flatnonzero(mask).tolist()
+            valid = [env.action_table.names[i] for i in valid_action_indices]
+            action_idx = agent.select_action(state_tensor, valid_action_indices)
+            action = env.action_table.names[action_idx]
+
+            print(f"Valid actions for {state['current_player']}: {valid}")
+            print(f"[{state['current_player']}] Action chosen: {action} | Resources: {dict(state['resources'])} | VP: {state['victory_points']}")
+
+            next_state, reward, done, _ = env.step(action_idx)
+            next_state_tensor = torch.from_numpy(env.observe().copy())
+
+            if writer:
+                writer.add(state_tensor.numpy(), action_idx, reward, mask, done or turn_count + 1 >= args.max_turns)
+            agent.remember(state_tensor, action_idx, reward, next_state_tensor, done, env.action_mask())
+            agent.replay()
+
+            state = next_state
+            state_tensor = next_state_tensor
+            total_reward += reward
+            turn_count += 1
+        agent.end_episode()
+
+        print(f"Episode {episode + 1} finished. Total Reward: {total_reward}, Winner: {state['current_player'] if reward > 0 else 'None'}\n")
+        rewards_per_episode.append(total_reward)
+        if episode % 10 == 0:
+            avg = sum(rewards_per_episode[-10:]) / 10
+            print(f"Average reward last 10 episodes: {avg:.2f}")
+
+        if checkpoints and (episode + 1) % args.checkpoint_every == 0:
+            checkpoints.save(agent, episode + 1, {'rewards_per_episode': rewards_per_episode})
+
+    agent.stop_learner()
+    if writer:
+        writer.close()
+    if checkpoints:
+        checkpoints.close()
+    torch.save(agent.model.state_dict(), args.model)
+    return rewards_per_episode
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--episodes", type=int, default=5000)
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--players", type=int, default=2, choices=[2, 3, 4])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="episodes between checkpoints")
+    parser.add_argument("--keep", type=int, default=3, help="number of checkpoints to retain")
+    parser.add_argument("--save-replay", action="store_true", help="include the replay buffer in checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from the latest checkpoint")
+    parser.add_argument("--async-learner", action="store_true", help="optimize on a background thread while acting")
+    parser.add_argument("--replay-ratio", type=float, default=1.0, help="sampled batches per environment step in async mode")
+    parser.add_argument("--updates-per-batch", type=int, default=1, help="gradient updates applied to each sampled batch")
+    parser.add_argument("--memory-size", type=int, default=10000, help="replay memory capacity in transitions")
+    parser.add_argument("--compact-replay", action="store_true",
+                        help="store replay positions bit-packed and decode observations only for sampled batches")
+    parser.add_argument("--n-step", type=int, default=1, help="rewards summed into each replay target")
+    parser.add_argument("--double-dqn", action="store_true",
+                        help="pick bootstrap actions with the online network and score them with the target network")
+    parser.add_argument("--quantize-actor", action="store_true",
+                        help="select actions with an int8 copy of the network, rebuilt after each weight load or target "
+                             "update (smaller, but slower per decision than float at this network size)")
+    parser.add_argument("--positions", help="start episodes from positions sampled from this file (see positions.py)")
+    parser.add_argument("--record-dir", help="stream self-play transitions to a sharded dataset in this directory")
+    parser.add_argument("--no-plot", action="store_true")
+    args = parser.parse_args()
+    if args.keep < 1:
+        parser.error("--keep must be at least 1")
+
+    rewards_per_episode = train(args)
+    if not args.no_plot:
+        plot_rewards(rewards_per_episode)
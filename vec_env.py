@@ -0,0 +1,162 @@
+import multiprocessing as mp
+import os
+import random
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from catanboard import generate_board
+from environment import CatanEnvironment
+from game import Game
+from player import make_players
+
+
+def make_env(num_players=2):
+    tiles, G = generate_board()
+    return CatanEnvironment(Game(make_players(num_players), tiles, G))
+
+
+def _attach(spec):
+    shm = shared_memory.SharedMemory(name=spec[0])
+    return shm, np.ndarray(spec[1], dtype=spec[2], buffer=shm.buf)
+
+
+def _worker(conn, specs, start, count, seed, max_turns, num_players):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        _serve(conn, specs, start, count, seed, max_turns, num_players)
+
+
+def _serve(conn, specs, start, count, seed, max_turns, num_players):
+    random.seed(seed)
+    np.random.seed(seed)
+
+    handles = {name: _attach(spec) for name, spec in specs.items()}
+    obs, masks, rewards, dones, actions = (
+        handles[name][1] for name in ('obs', 'masks', 'rewards', 'dones', 'actions')
+    )
+    envs = [make_env(num_players) for _ in range(count)]
+    turns = [0] * count
+
+    def reset(i):
+        env = envs[i]
+        env.reset()
+        turns[i] = 0
+        obs[start + i] = env.observe()
+        env.game.action_mask(env.action_table, out=masks[start + i])
+
+    try:
+        while True:
+            cmd = conn.recv()
+            if cmd == 'step':
+                for i, env in enumerate(envs):
+                    j = start + i
+                    _, reward, done, _ = env.step(int(actions[j]))
+                    turns[i] += 1
+                    done = done or turns[i] >= max_turns
+                    rewards[j] = reward
+                    dones[j] = done
+                    if done:
+                        reset(i)
+                    else:
+                        obs[j] = env.observe()
+                        env.game.action_mask(env.action_table, out=masks[j])
+            elif cmd == 'reset':
+                for i in range(count):
+                    reset(i)
+                rewards[start:start + count] = 0.0
+                dones[start:start + count] = False
+            elif cmd == 'close':
+                break
+            conn.send(True)
+    finally:
+        for shm, _ in handles.values():
+            shm.close()
+        conn.close()
+
+
+class SubprocVecEnv:
+    def __init__(self, num_workers, games_per_worker=1, max_turns=500, seed=None, start_method=None, num_players=2):
+        probe = make_env(num_players)
+        self.action_table = probe.action_table
+        self.obs_dim = probe.game.features.size
+        self.num_actions = len(probe.action_table)
+        self.num_envs = num_workers * games_per_worker
+        seed = random.randrange(2**31) if seed is None else seed
+
+        N = self.num_envs
+        layout = {
+            'obs': ((N, self.obs_dim), np.float32),
+            'masks': ((N, self.num_actions), np.bool_),
+            'rewards': ((N,), np.float32),
+            'dones': ((N,), np.bool_),
+            'actions': ((N,), np.int64),
+        }
+        self._shms = {}
+        specs = {}
+        for name, (shape, dtype) in layout.items():
+            nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._shms[name] = shm
+            specs[name] = (shm.name, shape, np.dtype(dtype).str)
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+        ctx = mp.get_context(start_method)
+        self._conns = []
+        self._procs = []
+        for w in range(num_workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker,
+                args=(child, specs, w * games_per_worker, games_per_worker, seed + w, max_turns, num_players),
+                daemon=True,
+            )
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self.closed = False
+
+    def _broadcast(self, cmd):
+        for conn in self._conns:
+            conn.send(cmd)
+        for conn in self._conns:
+            conn.recv()
+
+    def reset(self):
+        self._broadcast('reset')
+        return self.obs
+
+    def step_async(self, actions):
+        self.actions[:] = actions
+        for conn in self._conns:
+            conn.send('step')
+
+    def step_wait(self):
+        for conn in self._conns:
+            conn.recv()
+        return self.obs, self.rewards, self.dones, self.masks
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        for conn in self._conns:
+            conn.send('close')
+        for proc in self._procs:
+            proc.join()
+        for name in list(self._shms):
+            delattr(self, name)
+        for shm in self._shms.values():
+            shm.close()
+            shm.unlink()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
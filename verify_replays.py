@@ -0,0 +1,152 @@
+import argparse
+import io
+import os
+import pickle
+import random
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from catanboard import generate_board
+from dataset import replay_players
+from environment import CatanEnvironment
+from game import Game
+from player import Player
+from playback import record_state, simulate_and_record
+
+
+def _normalize(recorded):
+    state = dict(recorded)
+    state['buildings'] = {
+        name: {kind: sorted(pieces) for kind, pieces in buildings.items()}
+        for name, buildings in recorded['buildings'].items()
+    }
+    return state
+
+
+def first_difference(expected, actual, path=""):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in list(expected) + [k for k in actual if k not in expected]:
+            where = f"{path}.{key}" if path else str(key)
+            if key not in expected or key not in actual:
+                return where, expected.get(key), actual.get(key)
+            diff = first_difference(expected[key], actual[key], where)
+            if diff:
+                return diff
+        return None
+    if expected != actual:
+        return path, expected, actual
+    return None
+
+
+def state_difference(recorded, game):
+    # (field, recorded, replayed) for the first field where the game differs from a recorded state
+    return first_difference(_normalize(recorded), _normalize(record_state(game)))
+
+
+def verify(name, data):
+    record = pickle.loads(data)
+    random.seed(record['seed'])
+    np.random.seed(record['seed'])
+    start = time.perf_counter()
+
+    with redirect_stdout(io.StringIO()):
+        tiles, G = generate_board()
+        game = Game([Player(n) for n in replay_players(record)], tiles, G)
+        env = CatanEnvironment(game)
+
+        result = {'name': name, 'turns': 0, 'divergence': None}
+        board = [t.resource for t in tiles]
+        if record.get('tile_resources') is not None and board != record['tile_resources']:
+            result['divergence'] = (0, 'tile_resources', record['tile_resources'], board)
+            return result
+
+        states = record.get('states', [])
+        for turn, action in enumerate(record['actions']):
+            if turn < len(states):
+                diff = state_difference(states[turn], game)
+                if diff:
+                    result['divergence'] = (turn + 1,) + diff
+                    break
+            env.step(action)
+            result['turns'] += 1
+            if game.game_over:
+                break
+        else:
+            final = {p.name: p.victory_points() for p in game.players}
+            if record.get('final_vps') is not None and final != record['final_vps']:
+                diff = first_difference(record['final_vps'], final, 'final_vps')
+                result['divergence'] = (len(record['actions']),) + diff
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def iter_records(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for f in sorted(os.listdir(path)):
+                if f.endswith('.pkl'):
+                    with open(os.path.join(path, f), 'rb') as fh:
+                        yield os.path.join(path, f), fh.read()
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for member in sorted(archive.namelist()):
+                    if member.endswith('.pkl'):
+                        yield f"{path}:{member}", archive.read(member)
+        elif tarfile.is_tarfile(path):
+            with tarfile.open(path) as archive:
+                for member in archive.getmembers():
+                    if member.isfile() and member.name.endswith('.pkl'):
+                        yield f"{path}:{member.name}", archive.extractfile(member).read()
+        else:
+            with open(path, 'rb') as fh:
+                yield path, fh.read()
+
+
+def record_corpus(directory, games, max_moves, model_path):
+    os.makedirs(directory, exist_ok=True)
+    for i in range(games):
+        random.seed(i)
+        with redirect_stdout(io.StringIO()):
+            simulate_and_record(os.path.join(directory, f"game_{i:04d}.pkl"), max_moves=max_moves, model_path=model_path)
+    print(f"Recorded {games} games to {directory}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="recorded .pkl games, directories of them, or .zip/.tar archives")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--record", type=int, metavar="N", help="first record N seeded games into the (single) directory given")
+    parser.add_argument("--max-moves", type=int, default=1000)
+    parser.add_argument("--model", default="dqnCatan.pth")
+    args = parser.parse_args()
+
+    if args.record:
+        record_corpus(args.paths[0], args.record, args.max_moves, args.model)
+
+    start = time.perf_counter()
+    records = list(iter_records(args.paths))
+    failures = 0
+    turns = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(verify, name, data) for name, data in records]
+        for future in futures:
+            result = future.result()
+            turns += result['turns']
+            if result['divergence']:
+                failures += 1
+                turn, field, expected, actual = result['divergence']
+                print(f"DIVERGED {result['name']}: turn {turn}, {field}: recorded {expected!r}, replayed {actual!r}")
+            else:
+                print(f"ok       {result['name']}: {result['turns']} turns")
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(records) - failures}/{len(records)} games reproduced, "
+          f"{turns} turns in {elapsed:.2f}s ({turns / max(elapsed, 1e-9):.0f} turns/s)")
+    sys.exit(1 if failures else 0)